@@ -178,6 +178,66 @@ CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6
 REDIS_HOST = 'redis'
 REDIS_PORT = 6379
 REDIS_DB = 0
+REDIS_UNIX_SOCKET = os.environ.get('REDIS_UNIX_SOCKET') # path, used instead of host and port
+# one pool per worker process, size it as max_connections * workers <= redis maxclients
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = 5 # seconds to wait for a free connection
+REDIS_SOCKET_TIMEOUT = 5
+REDIS_SOCKET_CONNECT_TIMEOUT = 2
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
+PUBLICATIONS_PAGE_SIZE = 4
+PUBLICATIONS_MAX_PAGE_SIZE = 50
+PUBLICATIONS_LIST_CACHE_TIMEOUT = 60 * 5 # seconds, edits drop cached pages at once
+PUBLICATIONS_DETAIL_CACHE_TIMEOUT = 60 * 60
+PUBLICATIONS_USER_CARD_TIMEOUT = 60 * 60
+PUBLICATIONS_TAGS_CACHE_TIMEOUT = 60 * 60 * 24
+PUBLICATIONS_MAX_FILTER_TAGS = 10 # tags of one ?tag= filter, the rest are ignored
+PUBLICATIONS_POPULAR_TAGS_SIZE = 20
+PUBLICATIONS_MAX_POPULAR_TAGS_SIZE = 100
+PUBLICATIONS_POPULAR_TAGS_TIMEOUT = 60
+PUBLICATIONS_SEARCH_BACKEND = None # fts5, postgres, memory or basic, None picks it by the database
+PUBLICATIONS_SEARCH_MEMORY_TIMEOUT = 60 * 5 # seconds, the memory index is reloaded after it
+PUBLICATIONS_SEARCH_MAX_TERMS = 10
+PUBLICATIONS_USER_CARD_LRU_SIZE = 1000 # cards kept in every process
+PUBLICATIONS_USER_CARD_LRU_TIMEOUT = 30 # seconds, edits reach other processes after it
+
+# trending feed: views and votes of the last hours, an hour older weighs DECAY times less
+PUBLICATIONS_TRENDING_HOURS = 24
+PUBLICATIONS_TRENDING_DECAY = 0.8
+PUBLICATIONS_TRENDING_RATING_WEIGHT = 10 # a vote is worth 10 views
+PUBLICATIONS_TRENDING_TIMEOUT = 60 # seconds between rebuilds of the summed set
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',
+    }
+}
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    }
+    PUBLICATIONS_USER_CARD_LRU_SIZE = 0
+
+# None - write views on every request, 'memory' - merge them in the process, flushed by its timer,
+# 'redis' - merge them in a redis hash, only this one is flushed by the celery beat task below
+PUBLICATION_VIEWS_BUFFER = os.environ.get('PUBLICATION_VIEWS_BUFFER', 'redis') or None
+PUBLICATION_VIEWS_FLUSH_INTERVAL = 10 # seconds
+PUBLICATION_COUNTERS_SNAPSHOT_INTERVAL = 60 * 5 # seconds, redis counters are copied to PublicationCounter
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-publication-views': {
+        'task': 'publications.tasks.flush_publication_views',
+        'schedule': PUBLICATION_VIEWS_FLUSH_INTERVAL,
+    },
+    'snapshot-publication-counters': {
+        'task': 'publications.tasks.snapshot_publication_counters',
+        'schedule': PUBLICATION_COUNTERS_SNAPSHOT_INTERVAL,
+    },
+}
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -1,5 +1,24 @@
 from django.contrib import admin
-from .models import Text, File, Image, Video, Content
+from .models import Text, File, Image, Video, Content, PublicationCounter
+from .loaders import tag_loader
+
+
+class PublicationTagsAdmin(admin.ModelAdmin):
+    '''tag_list column filled by one tag loader call for the changelist page'''
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        publications = list(changelist.result_list) # evaluated once, the template reuses these objects
+        tags = tag_loader.get_tags(self.model, [publication.id for publication in publications])
+        for publication in publications:
+            publication.tag_names = tags[publication.id]
+        return changelist
+
+    def tag_list(self, obj):
+        tag_names = getattr(obj, 'tag_names', None)
+        if tag_names is None:
+            tag_names = tag_loader.get_tags(self.model, [obj.id])[obj.id]
+        return u", ".join(tag_names)
 
 
 @admin.register(Content)
@@ -21,4 +40,9 @@ class ImageAdmin(admin.ModelAdmin):
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'item_name', 'url']
\ No newline at end of file
+    list_display = ['id', 'item_name', 'url']
+
+@admin.register(PublicationCounter)
+class PublicationCounterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'publication', 'views', 'rating', 'updated_at']
+    list_filter = ['publication_content_type']
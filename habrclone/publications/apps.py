@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class PublicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'publications'
+
+    def ready(self):
+        from taggit.models import TaggedItem
+        from .models import SearchDocument
+        from .signals import (tagged_item_saved, tagged_item_deleted,
+                              search_document_saved, search_document_deleted)
+
+        post_save.connect(tagged_item_saved, sender = TaggedItem)
+        post_delete.connect(tagged_item_deleted, sender = TaggedItem)
+        post_save.connect(search_document_saved, sender = SearchDocument)
+        post_delete.connect(search_document_deleted, sender = SearchDocument)
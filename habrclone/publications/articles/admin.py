@@ -1,12 +1,8 @@
 from django.contrib import admin
+from ..admin import PublicationTagsAdmin
 from .models import Article
 
 @admin.register(Article)
-class ArticleAdmin(admin.ModelAdmin):
+class ArticleAdmin(PublicationTagsAdmin):
     list_display = ['id', 'title', 'author', 'status', 'level','tag_list']
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('tags')
-
-    def tag_list(self, obj):
-        return u", ".join(tag.name for tag in obj.tags.all())
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from ..serializers import PublicationListSerializer
+from ..serializers import PublicationListSerializer, PublicationTagsField
 from .models import Article
 from ..models import User
 from taggit.serializers import (TagListSerializerField,
@@ -19,7 +19,7 @@ class ArticleSerializer(TaggitSerializer, serializers.ModelSerializer):
         ]
 
 class ArticleListSerializer(TaggitSerializer, PublicationListSerializer):
-    tags = TagListSerializerField()
+    tags = PublicationTagsField()
 
     class Meta:
         model = Article
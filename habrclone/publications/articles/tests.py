@@ -1,9 +1,14 @@
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework_simplejwt.tokens import AccessToken
 from unittest.mock import patch
+import base64
 from ..models import User, Content, Text
 from .models import Article
+from .views import article_service
 
 class ArticleTest(APITestCase):
     
@@ -25,7 +30,7 @@ class ArticleTest(APITestCase):
         self.article = Article.objects.create( **self.article_data )
         Article.objects.create( **self.article_data )
         
-        text = Text.objects.create( creator = self.user, content = 'text item')
+        self.text = text = Text.objects.create( creator = self.user, content = 'text item')
         Content.objects.create(
             publication = self.article,
             item = text
@@ -44,6 +49,145 @@ class ArticleTest(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(len(res.data) <= 4)
 
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_counters(self, mock_obj):
+        mock_obj.mget.side_effect = lambda keys: [b'3' if key.endswith(':views') else None for key in keys]
+
+        res = self.client.get(self.article_list_url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(mock_obj.mget.call_count, 1) # one round trip for the whole page
+        mock_obj.exists.assert_not_called()
+        for article in res.data:
+            self.assertEqual(article['views'], 3)
+            self.assertEqual(article['rating'], 0)
+
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_page_size(self, mock_obj):
+        res = self.client.get(self.article_list_url, {'page_size': 1})
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], Article.objects.latest('created_at', 'id').id) # newest first
+
+        with self.settings(PUBLICATIONS_MAX_PAGE_SIZE = 1):
+            res = self.client.get(self.article_list_url, {'page_size': 1000})
+            self.assertEqual(len(res.data), 1)
+
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_queries(self, mock_obj):
+        self.article.tags.add('tg1')
+        self.article.mention.add(self.user)
+        articles = article_service.get_all_publications()
+
+        # count, page, mentions, tags - no text items, read_time is stored
+        with self.assertNumQueries(4):
+            page = article_service.paginate_publications( articles, 1 )
+            articles_data = article_service.list(page)
+        self.assertEqual(len(articles_data), 2)
+
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_read_time(self, mock_obj):
+        Article.objects.filter(id = self.article.id).update(read_time = 7)
+
+        res = self.client.get(self.article_list_url)
+        read_times = {article['id']: article['read_time'] for article in res.data}
+        self.assertEqual(read_times[self.article.id], 7)
+
+    @override_settings(CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_cache_keys(self, mock_obj):
+        cache.clear()
+        mock_obj.mget.side_effect = lambda keys: [None for key in keys]
+        self.client.credentials()
+        self.client.get(self.article_list_url, {'page_number': 1})
+        self.client.get(self.article_list_url, {'cursor': ''})
+
+        # spellings of the same page share one cache entry
+        for params in ({'page_number': 'abc'}, {'page_number': '01'}, {'page_number': ' 1'}, {},
+                       {'cursor': 'zzz'}, {'cursor': 'x' * 1000}, {'cursor': self.encode('["next", "2020-01-01", 1e400]')},
+                       {'cursor': self.encode(f'["next", "2020-01-01", {10 ** 30}]')}):
+            with self.assertNumQueries(0):
+                res = self.client.get(self.article_list_url, params)
+            self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(article_service.get_page_number('10' * 100), article_service.max_page_number)
+        self.assertEqual(article_service.get_page_number(-3), 0)
+
+        # a naive position is read as the current time zone
+        direction, created_at, publication_id = article_service._decode_cursor(
+            self.encode(f'["next", "2020-01-01T00:00:00", {self.article.id}]')
+        )
+        self.assertFalse(timezone.is_naive(created_at))
+
+    def encode(self, position):
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @override_settings(CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_cache(self, mock_obj):
+        cache.clear()
+        mock_obj.mget.side_effect = lambda keys: [None for key in keys]
+        self.client.get(self.article_list_url)
+
+        mock_obj.mget.side_effect = lambda keys: [b'5' for key in keys]
+        self.client.credentials() # anonymous, no user query
+        with self.assertNumQueries(0):
+            res = self.client.get(self.article_list_url)
+        self.assertEqual(len(res.data), 2)
+        self.assertTrue(all(article['views'] == 5 for article in res.data)) # counters are live
+
+        access_token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION = f'Bearer {access_token}')
+        res = self.client.put(self.article_edit_url, {
+            'status': 1, 'tags': ['tg1'], 'intro_text': 'intro_text', 'title': 'New title', 'level': 'easy'
+        })
+        self.assertEqual(res.status_code, 204)
+
+        res = self.client.get(self.article_list_url)
+        titles = {article['id']: article['title'] for article in res.data}
+        self.assertEqual(titles[self.article.id], 'New title')
+
+        res = self.client.delete(self.article_edit_url)
+        res = self.client.get(self.article_list_url)
+        self.assertEqual(len(res.data), 1)
+
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_tags(self, mock_obj):
+        mock_obj.mget.side_effect = lambda keys: [None for key in keys]
+        other = Article.objects.exclude(id = self.article.id).get()
+        self.article.tags.add('django', 'python')
+        other.tags.add('python', 'redis')
+
+        def get_ids(query):
+            res = self.client.get(f'{self.article_list_url}?{query}')
+            self.assertEqual(res.status_code, 200)
+            return {article['id'] for article in res.data}
+
+        self.assertEqual(get_ids('tag=django'), {self.article.id})
+        self.assertEqual(get_ids('tag=python'), {self.article.id, other.id})
+        self.assertEqual(get_ids('tag=django&tag=redis'), {self.article.id, other.id})
+        self.assertEqual(get_ids('tag=django,python&tag_mode=and'), {self.article.id})
+        self.assertEqual(get_ids('tag=django&tag=redis&tag_mode=and'), set())
+        self.assertEqual(get_ids('tag=go'), set())
+
+        res = self.client.get(f'{self.article_list_url}?tag=python&cursor=&page_size=1')
+        self.assertEqual([article['id'] for article in res.data['results']], [other.id])
+        res = self.client.get(f"{self.article_list_url}?tag=python&cursor={res.data['next']}&page_size=1")
+        self.assertEqual([article['id'] for article in res.data['results']], [self.article.id])
+
+    @override_settings(CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @patch('publications.articles.views.article_service.r')
+    def test_article_list_tags_cache(self, mock_obj):
+        cache.clear()
+        mock_obj.mget.side_effect = lambda keys: [None for key in keys]
+        self.article.tags.add('django')
+
+        self.assertEqual(len(self.client.get(self.article_list_url).data), 2)
+        res = self.client.get(f'{self.article_list_url}?tag=django') # not the cached common feed
+        self.assertEqual([article['id'] for article in res.data], [self.article.id])
+
+        with self.assertNumQueries(1): # request.user only
+            res = self.client.get(f'{self.article_list_url}?tag=django')
+        self.assertEqual(len(res.data), 1)
+
     @patch('publications.articles.views.article_service.r')
     def test_create_article(self, mock_obj):
         mock_obj.return_value = b'0' # mock redis
@@ -69,6 +213,33 @@ class ArticleTest(APITestCase):
         else:
             self.assertEqual( len(items), 0)
 
+
+    @override_settings(CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @patch('publications.articles.views.article_service.r')
+    def test_article_detail_cache(self, mock_obj):
+        cache.clear()
+        mock_obj.mget.side_effect = lambda keys: [None for key in keys]
+        self.client.get(self.article_detail_url)
+
+        mock_obj.mget.side_effect = lambda keys: [b'5' for key in keys]
+        self.client.credentials()
+        with self.assertNumQueries(0):
+            res = self.client.get(self.article_detail_url)
+        self.assertEqual(res.data['views'], 5)
+        self.assertEqual(res.data['items'][0]['item']['content'], 'text item')
+
+        access_token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION = f'Bearer {access_token}')
+        item_url = reverse('publications:item_detail', kwargs = {'model_name': 'text', 'item_id': self.text.id})
+        res = self.client.put(item_url, {'content': 'new text'})
+        self.assertEqual(res.status_code, 204)
+
+        res = self.client.get(self.article_detail_url)
+        self.assertEqual(res.data['items'][0]['item']['content'], 'new text')
+
+        self.client.delete(self.article_edit_url)
+        res = self.client.get(self.article_detail_url)
+        self.assertEqual(res.status_code, 404)
     
     def test_bad_user(self):
         user = User.objects.create(
@@ -7,5 +7,7 @@ urlpatterns = [
     path('', views.ListAPIView.as_view(), name = 'list'),
     path('<int:article_id>/', views.DetailAPIView.as_view(), name = 'detail'),
     path('mine/', views.MineAPIView.as_view(), name = 'mine'),
+    path('top/', views.RankedAPIView.as_view(), {'feed': 'top'}, name = 'top'),
+    path('trending/', views.RankedAPIView.as_view(), {'feed': 'trending'}, name = 'trending'),
     path('edit/<int:article_id>/', views.EditAPIView.as_view(), name = 'edit'),
 ]
\ No newline at end of file
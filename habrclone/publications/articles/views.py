@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from ..views import PublicationEditAPIView
+from ..search import search_index
 from .services import ArticleService
 from .models import Article
 from .serializers import ArticleSerializer
@@ -53,7 +54,8 @@ class ListAPIView(APIView):
                             "level": "easy",
                             "read_time": 2,
                             "views": 6,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -64,15 +66,42 @@ class ListAPIView(APIView):
                 'page_number', openapi.IN_QUERY,
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'tag', openapi.IN_QUERY,
+                description = "Tag name to filter by, repeat it or separate the names with commas for several tags",
+                type = openapi.TYPE_ARRAY, items = openapi.Items(type = openapi.TYPE_STRING),
+                collection_format = 'multi'
+            ),
+            openapi.Parameter(
+                'tag_mode', openapi.IN_QUERY,
+                description = "'or' (default) - publications with any of the tags, 'and' - with every tag",
+                type = openapi.TYPE_STRING, enum = ['or', 'and']
+            ),
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        articles = article_service.get_all_publications()
-        page = article_service.paginate_publications( articles, page_number )
-        articles_data = article_service.list(page)
+        tags, tags_mode = article_service.get_tags_filter(request.GET.getlist('tag'), request.GET.get('tag_mode'))
         
+        articles_data, cursors = article_service.get_list_page(
+            page_number, cursor, page_size, user = request.user, tags = tags, tags_mode = tags_mode
+        )
+        if cursors is not None:
+            return Response({ 'results': articles_data, **cursors })
+
         return Response( articles_data )
 
     @swagger_auto_schema(
@@ -98,9 +127,11 @@ class ListAPIView(APIView):
 
         serializer = ArticleSerializer(data = request.data)
         if serializer.is_valid():
-            serializer.save(author = request.user)
+            article = serializer.save(author = request.user)
             if serializer.validated_data['status']:
                 article_service.add_publication_creation()
+                article_service.cache.bump_version() # the new publication opens the feed
+                search_index.update(article)
             
             return Response(status = status.HTTP_201_CREATED)
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
@@ -159,7 +190,8 @@ class DetailAPIView(APIView):
                             "level": "easy",
                             "read_time": 2,
                             "views": 6,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -170,11 +202,39 @@ class DetailAPIView(APIView):
         }
     )
     def get(self, request, article_id):
-        data = article_service.detail(article_id)
+        data = article_service.detail(article_id, request.user)
         if isinstance(data, int):
             return Response(status = data)
         return Response(data)
 
+class RankedAPIView(APIView):
+
+    @swagger_auto_schema(
+        operation_description = "Retrieve the top (by rating) or trending (recent views and votes) articles.",
+        manual_parameters = [
+            openapi.Parameter(
+                'page_number', openapi.IN_QUERY,
+                description = "Page number for pagination",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Same items as the list, best first",
+            )
+        }
+    )
+    def get(self, request, feed):
+        articles_data = article_service.get_ranked_page(
+            feed, request.GET.get('page_number', 1), request.GET.get('page_size'), request.user
+        )
+        return Response( articles_data )
+
 class MineAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -214,7 +274,8 @@ class MineAPIView(APIView):
                             "level": "easy",
                             "read_time": 2,
                             "views": 6,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -230,15 +291,31 @@ class MineAPIView(APIView):
                 'page_number', openapi.IN_QUERY,
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
             )
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        articles = article_service.get_all_publications().filter( author = request.user )
-        page = article_service.paginate_publications( articles, page_number )
-        articles_data = article_service.list(page)
+        articles_data, cursors = article_service.get_list_page(
+            page_number, cursor, page_size,
+            publications_list = article_service.get_all_publications().filter( author = request.user ),
+            user = request.user
+        )
+        if cursors is not None:
+            return Response({ 'results': articles_data, **cursors })
 
         return Response( articles_data )
 
@@ -0,0 +1,126 @@
+from collections import Counter
+from threading import Lock, Timer
+from django.conf import settings
+from .ranking import publication_ranking
+import atexit
+import redis
+import time
+import uuid
+
+class ViewsBuffer:
+    '''
+    Collects views increments and writes them to redis in bulk.
+
+    PUBLICATION_VIEWS_BUFFER setting:
+        None     - every page is written immediately (one pipeline per page)
+        'memory' - merged in process, flushed PUBLICATION_VIEWS_FLUSH_INTERVAL seconds after
+                   the first pending view by a timer thread of the same process
+        'redis'  - merged in a redis hash, flushed by the flush_publication_views celery task
+    The celery task only drains the redis hash, it runs in the worker and can't see
+    the memory of the web processes.
+    '''
+    pending_key = 'views:pending'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.pending = Counter()
+        self.flushed_at = time.monotonic()
+        self.r = None # last used client, for the timer and the flush at exit
+        self.timer = None
+
+    @property
+    def mode(self):
+        return getattr(settings, 'PUBLICATION_VIEWS_BUFFER', None)
+
+    def add(self, r, keys):
+        if not keys:
+            return
+
+        if self.mode == 'memory':
+            with self.lock:
+                self.pending.update(keys)
+                self.r = r
+                flush = time.monotonic() - self.flushed_at >= settings.PUBLICATION_VIEWS_FLUSH_INTERVAL
+                if not flush and self.timer is None: # an idle process flushes too
+                    self.timer = Timer(settings.PUBLICATION_VIEWS_FLUSH_INTERVAL, self._flush_on_timer)
+                    self.timer.daemon = True
+                    self.timer.start()
+            if flush:
+                self.flush(r)
+            return
+
+        if self.mode == 'redis':
+            pipe = r.pipeline(transaction = False)
+            for key, amount in Counter(keys).items():
+                pipe.hincrby(self.pending_key, key, amount)
+            pipe.execute()
+        else:
+            self._write(r, Counter(keys))
+
+    def flush(self, r):
+        if self.mode == 'redis':
+            return self._flush_redis(r)
+
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.flushed_at = time.monotonic()
+
+        try:
+            self._write(r, pending)
+        except Exception:
+            with self.lock:
+                self.pending.update(pending) # dont lose views, try again on next flush
+            raise
+        return sum(pending.values())
+
+    def _flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush(self.r)
+        except Exception:
+            pass # the views are pending again, the next add starts a new timer
+
+    def _flush_redis(self, r):
+        # rename is atomic so views added during the flush go to a fresh hash
+        flushing_key = f'{self.pending_key}:{uuid.uuid4().hex}'
+        try:
+            r.rename(self.pending_key, flushing_key)
+        except redis.ResponseError: # nothing to flush
+            return 0
+
+        pending = Counter({key.decode(): int(amount)
+                           for key, amount in r.hgetall(flushing_key).items()})
+        try:
+            self._write(r, pending)
+        except Exception:
+            # like the memory mode, merged back so the next flush tries them again
+            pipe = r.pipeline(transaction = False)
+            for key, amount in pending.items():
+                pipe.hincrby(self.pending_key, key, amount)
+            pipe.delete(flushing_key)
+            pipe.execute()
+            raise
+        r.delete(flushing_key)
+        return sum(pending.values())
+
+    def _write(self, r, pending):
+        if not pending:
+            return
+
+        pipe = r.pipeline(transaction = False)
+        for key, amount in pending.items():
+            pipe.incrby(key, amount)
+            publication_app, publication_id, _ = key.split(':') # {app}:{id}:views
+            publication_ranking.add_views(pipe, publication_app, publication_id, amount)
+        pipe.execute()
+
+views_buffer = ViewsBuffer()
+
+@atexit.register
+def _flush_on_exit():
+    if views_buffer.mode == 'memory' and views_buffer.pending and views_buffer.r is not None:
+        try:
+            views_buffer.flush(views_buffer.r)
+        except Exception:
+            pass
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from threading import Lock
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .serializers import UserSerializer
+import time
+
+class PublicationCache:
+    '''
+    Rendered publication payloads without the live counters (views, rating).
+    Keys of list pages carry the version of the app, a new version makes
+    every cached page of the app unreachable, old pages just expire.
+    Detail payloads are kept per publication and deleted on its edits.
+    '''
+
+    def __init__(self, publication_app):
+        self.publication_app = publication_app
+
+    def _get_version_key(self):
+        return f'publications:{self.publication_app}:version'
+
+    def get_version(self):
+        version = cache.get(self._get_version_key())
+        if version is None:
+            cache.add(self._get_version_key(), time.time_ns(), timeout = None)
+            version = cache.get(self._get_version_key())
+        return version
+
+    def bump_version(self):
+        # a fresh value instead of incr, an evicted version key can't bring old pages back
+        cache.set(self._get_version_key(), time.time_ns(), timeout = None)
+
+    def get_list_key(self, page_key, page_size):
+        return f'publications:{self.publication_app}:list:{self.get_version()}:{page_key}:{page_size}'
+
+    def get_list(self, key):
+        return cache.get(key)
+
+    def set_list(self, key, publications_data):
+        cache.set(key, publications_data, settings.PUBLICATIONS_LIST_CACHE_TIMEOUT)
+
+    def _get_detail_key(self, publication_id):
+        return f'publications:{self.publication_app}:detail:{publication_id}'
+
+    def get_detail(self, publication_id):
+        return cache.get(self._get_detail_key(publication_id))
+
+    def set_detail(self, publication_id, publication_data):
+        cache.set(self._get_detail_key(publication_id), publication_data,
+                  settings.PUBLICATIONS_DETAIL_CACHE_TIMEOUT)
+
+    def delete_detail(self, publication_id):
+        cache.delete(self._get_detail_key(publication_id))
+
+    def delete_details(self, publications_ids):
+        cache.delete_many([self._get_detail_key(publication_id) for publication_id in publications_ids])
+
+def invalidate_publication(publication):
+    publication_cache = PublicationCache(publication._meta.app_label)
+    publication_cache.bump_version()
+    publication_cache.delete_detail(publication.id)
+
+class UserCardCache:
+    '''
+    Authors and mentions as UserSerializer renders them, by user id.
+    A small LRU in the process sits in front of the django cache. Other processes
+    can't drop their LRU entries, so those live only PUBLICATIONS_USER_CARD_LRU_TIMEOUT seconds.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.cards = OrderedDict() # user_id: (expires_at, card)
+
+    def _get_key(self, user_id):
+        return f'publications:user_card:{user_id}'
+
+    def get_many(self, users):
+        '''{user_id: card} for the loaded users, one cache get_many for all LRU misses'''
+        users = {user.id: user for user in users}
+        user_cards, now = {}, time.monotonic()
+        with self.lock:
+            for user_id in users:
+                entry = self.cards.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self.cards.move_to_end(user_id)
+                    user_cards[user_id] = entry[1]
+
+        missing_ids = [user_id for user_id in users if user_id not in user_cards]
+        if not missing_ids:
+            return user_cards
+
+        cached = cache.get_many([self._get_key(user_id) for user_id in missing_ids])
+        rendered = {}
+        for user_id in missing_ids:
+            card = cached.get(self._get_key(user_id))
+            if card is None:
+                card = rendered[user_id] = dict(UserSerializer(users[user_id]).data)
+            user_cards[user_id] = card
+        if rendered:
+            cache.set_many({self._get_key(user_id): card for user_id, card in rendered.items()},
+                           settings.PUBLICATIONS_USER_CARD_TIMEOUT)
+
+        self._remember({user_id: user_cards[user_id] for user_id in missing_ids})
+        return user_cards
+
+    def _remember(self, user_cards):
+        size = settings.PUBLICATIONS_USER_CARD_LRU_SIZE
+        if not size:
+            return
+        expires_at = time.monotonic() + settings.PUBLICATIONS_USER_CARD_LRU_TIMEOUT
+        with self.lock:
+            for user_id, card in user_cards.items():
+                self.cards[user_id] = (expires_at, card)
+                self.cards.move_to_end(user_id)
+            while len(self.cards) > size:
+                self.cards.popitem(last = False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.cards.pop(user_id, None)
+        cache.delete(self._get_key(user_id))
+
+user_card_cache = UserCardCache()
+
+def invalidate_user(user):
+    user_card_cache.delete(user.id)
+    for publication_app, model_name in (('articles', 'Article'), ('news', 'News'), ('posts', 'Post')):
+        publication_cache = PublicationCache(publication_app)
+        publication_cache.bump_version() # cached feeds have the card inside
+        # so do the detail pages of the publications written by or mentioning the user
+        publications_ids = apps.get_model(publication_app, model_name).objects.filter(
+            Q(author = user) | Q(mention = user)
+        ).values_list('id', flat = True).distinct()
+        publication_cache.delete_details(publications_ids)
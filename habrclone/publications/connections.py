@@ -0,0 +1,53 @@
+from django.conf import settings
+from threading import Lock
+import os
+import redis
+
+_pool = None
+_pool_lock = Lock()
+
+def create_redis_pool():
+    '''
+    Blocking pool: when all REDIS_MAX_CONNECTIONS are busy a request waits
+    REDIS_POOL_TIMEOUT seconds for a free one instead of failing at once.
+    redis-py drops inherited connections after fork, so one pool per worker process.
+    '''
+    options = {
+        'db': settings.REDIS_DB,
+        'max_connections': settings.REDIS_MAX_CONNECTIONS,
+        'timeout': settings.REDIS_POOL_TIMEOUT,
+        'socket_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        'health_check_interval': settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+    if settings.REDIS_UNIX_SOCKET:
+        return redis.BlockingConnectionPool(
+            connection_class = redis.UnixDomainSocketConnection,
+            path = settings.REDIS_UNIX_SOCKET,
+            **options
+        )
+    return redis.BlockingConnectionPool(host = settings.REDIS_HOST, port = settings.REDIS_PORT, **options)
+
+def get_redis_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_redis_pool()
+    return _pool
+
+def get_redis():
+    '''Client on the process wide pool, cheap to create, no connection is opened until a command'''
+    return redis.Redis(connection_pool = get_redis_pool())
+
+def get_redis_pool_stats(pool = None):
+    pool = pool or get_redis_pool()
+    created = len(pool._connections)
+    idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+    return {
+        'pid': os.getpid(),
+        'max_connections': pool.max_connections,
+        'created': created,
+        'in_use': created - idle,
+        'idle': idle,
+    }
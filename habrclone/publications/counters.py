@@ -0,0 +1,78 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from .models import PublicationCounter
+
+# app label: model name of the publications with counters in redis
+COUNTED_PUBLICATIONS = {
+    'articles': 'Article',
+    'news': 'News',
+    'posts': 'Post',
+}
+
+class CounterSnapshot:
+    '''
+    Copies {app}:{id}:views and {app}:{id}:rating between redis and PublicationCounter.
+    snapshot() walks the keys with SCAN and upserts them in batches,
+    warm_up() loads the table back, e.g. after redis lost its data.
+    '''
+
+    def _get_publications_ids(self, r, publication_app):
+        publications_ids = set()
+        for counter in ('views', 'rating'):
+            for key in r.scan_iter(match = f'{publication_app}:*:{counter}', count = 1000):
+                publication_id = key.decode().split(':')[1]
+                if publication_id.isdigit():
+                    publications_ids.add(int(publication_id))
+        return sorted(publications_ids)
+
+    def snapshot(self, r, batch_size = 500):
+        saved = 0
+        for publication_app, model_name in COUNTED_PUBLICATIONS.items():
+            model = apps.get_model(publication_app, model_name)
+            model_ct = ContentType.objects.get_for_model(model)
+            publications_ids = self._get_publications_ids(r, publication_app)
+
+            for start in range(0, len(publications_ids), batch_size):
+                batch = publications_ids[start:start + batch_size]
+                batch = list(model.objects.filter(id__in = batch).values_list('id', flat = True)) # skip deleted
+                if not batch:
+                    continue
+
+                keys = []
+                for publication_id in batch:
+                    keys += [f'{publication_app}:{publication_id}:views', f'{publication_app}:{publication_id}:rating']
+                values = r.mget(keys)
+
+                PublicationCounter.objects.bulk_create([
+                    PublicationCounter(
+                        publication_content_type = model_ct,
+                        publication_object_id = publication_id,
+                        views = int(values[2 * index] or 0),
+                        rating = int(values[2 * index + 1] or 0),
+                    ) for index, publication_id in enumerate(batch)
+                ], update_conflicts = True, # one upsert per batch
+                   unique_fields = ['publication_content_type', 'publication_object_id'],
+                   update_fields = ['views', 'rating', 'updated_at'])
+                saved += len(batch)
+        return saved
+
+    def warm_up(self, r, batch_size = 500, force = False):
+        '''Without force the keys which are already in redis are kept, they are newer'''
+        loaded = 0
+        for publication_app, model_name in COUNTED_PUBLICATIONS.items():
+            model_ct = ContentType.objects.get_for_model(apps.get_model(publication_app, model_name))
+            counters = PublicationCounter.objects.filter(publication_content_type = model_ct)\
+                                                 .order_by('publication_object_id')\
+                                                 .values_list('publication_object_id', 'views', 'rating')
+
+            pipe = r.pipeline(transaction = False)
+            for publication_id, views, rating in counters.iterator(chunk_size = batch_size):
+                pipe.set(f'{publication_app}:{publication_id}:views', views, nx = not force)
+                pipe.set(f'{publication_app}:{publication_id}:rating', rating, nx = not force)
+                loaded += 1
+                if loaded % batch_size == 0:
+                    pipe.execute()
+            pipe.execute()
+        return loaded
+
+counter_snapshot = CounterSnapshot()
@@ -0,0 +1,168 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import Lock
+import math
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+class InvertedIndex:
+    '''
+    In process inverted index ranked with BM25.
+    Every term has two parallel arrays: numbers of the documents having it (ascending,
+    a new or updated document always gets the next number) and its frequency there.
+    A title word counts title_weight times. The vocabulary is kept sorted, so a prefix
+    is a bisect and a slice. Removed documents are only marked, their postings are
+    dropped when the dead ones outnumber the live ones.
+    '''
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, title_weight = 4):
+        self.title_weight = title_weight
+        self.lock = Lock()
+        self.postings = {} # term: (array of document numbers, array of frequencies)
+        self.terms = [] # sorted vocabulary
+        self.keys = [] # document number: key, None when removed
+        self.lengths = array('I')
+        self.numbers = {} # key: document number
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def add(self, key, title, body):
+        '''Adds the document or replaces the one with the same key'''
+        with self.lock:
+            self._remove(key)
+            for term in self._add(key, title, body):
+                insort(self.terms, term)
+
+    def load(self, documents):
+        '''Bulk add of (key, title, body), the vocabulary is sorted once at the end'''
+        with self.lock:
+            for key, title, body in documents:
+                self._remove(key)
+                self.terms += self._add(key, title, body)
+            self.terms.sort()
+
+    def _add(self, key, title, body):
+        frequencies = Counter(tokenize(body))
+        for term in tokenize(title):
+            frequencies[term] += self.title_weight
+
+        number = len(self.keys)
+        self.keys.append(key)
+        self.numbers[key] = number
+        length = sum(frequencies.values())
+        self.lengths.append(length)
+        self.total_length += length
+
+        new_terms = []
+        for term, frequency in frequencies.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('I'), array('I'))
+                new_terms.append(term)
+            entry[0].append(number)
+            entry[1].append(frequency)
+        return new_terms
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        number = self.numbers.pop(key, None)
+        if number is None:
+            return
+        self.keys[number] = None
+        self.total_length -= self.lengths[number]
+        if len(self.keys) - len(self.numbers) > max(len(self.numbers), 64):
+            self._compact()
+
+    def _compact(self):
+        '''Renumbers the live documents and rebuilds the postings without the removed ones'''
+        renumbered = array('i', [-1]) * len(self.keys)
+        keys, lengths = [], array('I')
+        for number, key in enumerate(self.keys):
+            if key is not None:
+                renumbered[number] = len(keys)
+                keys.append(key)
+                lengths.append(self.lengths[number])
+
+        postings = {}
+        for term, (numbers, frequencies) in self.postings.items():
+            live = [(renumbered[number], frequency) for number, frequency in zip(numbers, frequencies)
+                    if renumbered[number] >= 0]
+            if live:
+                postings[term] = (array('I', [number for number, _ in live]),
+                                  array('I', [frequency for _, frequency in live]))
+
+        self.postings, self.keys, self.lengths = postings, keys, lengths
+        self.numbers = {key: number for number, key in enumerate(keys)}
+        self.terms = sorted(postings)
+
+    def _get_expansions(self, prefix):
+        start = bisect_left(self.terms, prefix)
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(prefix):
+            end += 1
+        return self.terms[start:end]
+
+    def _score_term(self, prefix, average_length, candidates = None):
+        '''{document number: score} of the documents with a word starting with prefix, best expansion counts'''
+        documents, keys, lengths = len(self.numbers), self.keys, self.lengths
+        norm_base, norm_scale = self.k1 * (1 - self.b), self.k1 * self.b / average_length
+        scores = {}
+        for term in self._get_expansions(prefix):
+            numbers, frequencies = self.postings[term]
+            frequency_in_documents = min(len(numbers), documents) # postings of removed documents wait for compaction
+            idf = math.log(1 + (documents - frequency_in_documents + 0.5) / (frequency_in_documents + 0.5)) * (self.k1 + 1)
+            for number, frequency in zip(numbers, frequencies):
+                if keys[number] is None or (candidates is not None and number not in candidates):
+                    continue
+                score = idf * frequency / (frequency + norm_base + norm_scale * lengths[number])
+                if score > scores.get(number, 0):
+                    scores[number] = score
+        return scores
+
+    def search(self, terms, offset = 0, limit = 10, key_filter = None):
+        '''Keys of the documents matching every term as a prefix, best first'''
+        with self.lock:
+            if not terms or not self.numbers:
+                return []
+            average_length = self.total_length / len(self.numbers) or 1
+
+            scores = None
+            for term in terms:
+                term_scores = self._score_term(term, average_length, scores)
+                if scores is None:
+                    scores = term_scores
+                else: # only the documents which had the previous terms are scored
+                    scores = {number: score + term_scores[number] for number, score in scores.items()
+                              if number in term_scores}
+                if not scores:
+                    return []
+
+            found = [(score, number) for number, score in scores.items()
+                     if key_filter is None or key_filter(self.keys[number])]
+            found.sort(key = lambda item: (-item[0], -item[1])) # newer documents win ties
+            return [self.keys[number] for _, number in found[offset:offset + limit]]
+
+    def get_stats(self):
+        '''Sizes of the index, bytes are the arrays only'''
+        with self.lock:
+            postings = sum(len(numbers) for numbers, _ in self.postings.values())
+            array_bytes = sum(numbers.itemsize * len(numbers) + frequencies.itemsize * len(frequencies)
+                              for numbers, frequencies in self.postings.values())
+            return {
+                'documents': len(self.numbers),
+                'terms': len(self.postings),
+                'postings': postings,
+                'bytes': array_bytes + self.lengths.itemsize * len(self.lengths),
+            }
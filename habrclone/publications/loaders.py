@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Case, When, OuterRef, Subquery, TextField
+from taggit.models import TaggedItem
+from .models import Content, Text, Image, Video, File
+
+def _render_file(model, field_name):
+    storage = model._meta.get_field(field_name).storage
+
+    def render(value):
+        return storage.url(value) if value else None
+    return render
+
+# item_name: (model, column holding the payload, field name in the output, renderer)
+ITEM_TYPES = {
+    'text': (Text, 'content', 'content', str),
+    'image': (Image, 'image', 'image', _render_file(Image, 'image')),
+    'video': (Video, 'url', 'url', str),
+    'file': (File, 'file', 'file', _render_file(File, 'file')),
+}
+
+class ContentLoader:
+    '''
+    Loads the contents of many publications in a single query.
+    Every item type keeps its payload in one column, so the item is read
+    with a correlated subquery picked by content type instead of a query per type.
+    The result is the same as ContentSerializer output.
+    '''
+
+    def get_contents(self, publication_ct, publications_ids, items_names = ITEM_TYPES.keys()):
+        items_cts = {
+            ContentType.objects.get_for_model(ITEM_TYPES[item_name][0]).id: item_name
+            for item_name in items_names
+        }
+
+        value = Case(*[
+            When(content_type_id = item_ct_id, then = self._get_item_value(item_name))
+            for item_ct_id, item_name in items_cts.items()
+        ], output_field = TextField())
+        contents = Content.objects.filter(
+            publication_content_type = publication_ct,
+            publication_object_id__in = publications_ids,
+            content_type_id__in = list(items_cts)
+        ).annotate(value = value)\
+         .order_by('publication_object_id', 'position', 'id')\
+         .values_list('id', 'publication_object_id', 'content_type_id', 'value')
+
+        publications_contents = {publication_id: [] for publication_id in publications_ids}
+        for content_id, publication_id, item_ct_id, value in contents:
+            publications_contents[publication_id].append({
+                'id': content_id,
+                'item': self.render_item(items_cts[item_ct_id], value),
+            })
+        return publications_contents
+
+    def render_item(self, item_name, value):
+        if value is None: # item was deleted without its content
+            return None
+
+        _, _, output_field, render = ITEM_TYPES[item_name]
+        return {'item_name': item_name, output_field: render(value)}
+
+    def _get_item_value(self, item_name):
+        model, column, _, _ = ITEM_TYPES[item_name]
+        return Subquery(model.objects.filter(id = OuterRef('object_id')).values(column)[:1])
+
+content_loader = ContentLoader()
+
+class TagLoader:
+    '''
+    Tag names of many publications: cached names first, one TaggedItem join Tag
+    query for the rest. Names are cached per publication until its tags change.
+    '''
+
+    def _get_key(self, model, publication_id):
+        return f'publications:{model._meta.app_label}:tags:{publication_id}'
+
+    def get_tags(self, model, publications_ids):
+        keys = {publication_id: self._get_key(model, publication_id) for publication_id in publications_ids}
+        cached = cache.get_many(list(keys.values()))
+        tags = {publication_id: cached[key] for publication_id, key in keys.items() if key in cached}
+
+        missing_ids = [publication_id for publication_id in publications_ids if publication_id not in tags]
+        if not missing_ids:
+            return tags
+
+        loaded = {publication_id: [] for publication_id in missing_ids}
+        tagged_items = TaggedItem.objects.filter(
+            content_type = ContentType.objects.get_for_model(model),
+            object_id__in = missing_ids
+        ).order_by('object_id', 'tag__name').values_list('object_id', 'tag__name')
+        for publication_id, tag_name in tagged_items:
+            loaded[publication_id].append(tag_name)
+
+        cache.set_many({keys[publication_id]: names for publication_id, names in loaded.items()},
+                       settings.PUBLICATIONS_TAGS_CACHE_TIMEOUT)
+        tags.update(loaded)
+        return tags
+
+    def delete(self, model, publication_id):
+        cache.delete(self._get_key(model, publication_id))
+
+tag_loader = TagLoader()
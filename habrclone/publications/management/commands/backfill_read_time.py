@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from publications.models import Content, Text
+from publications.articles.models import Article
+from publications.news.models import News
+from publications.posts.models import Post
+
+class Command(BaseCommand):
+    help = 'Compute words_count of text items and read_time of publications for existing data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        texts = []
+        for text in Text.objects.only('id', 'content').iterator(chunk_size = batch_size):
+            text.words_count = len( text.content.split() )
+            texts.append(text)
+            if len(texts) >= batch_size:
+                Text.objects.bulk_update(texts, ['words_count'])
+                texts = []
+        Text.objects.bulk_update(texts, ['words_count'])
+        self.stdout.write(f'Text items: {Text.objects.count()}')
+
+        text_ct = ContentType.objects.get_for_model(Text)
+        for model in (Article, News, Post):
+            model_ct = ContentType.objects.get_for_model(model)
+            publications_ids = list(model.objects.order_by('id').values_list('id', flat = True))
+
+            for start in range(0, len(publications_ids), batch_size):
+                batch = publications_ids[start:start + batch_size]
+                contents = Content.objects.filter(
+                    publication_content_type = model_ct,
+                    publication_object_id__in = batch,
+                    content_type = text_ct
+                ).values_list('publication_object_id', 'object_id')
+                contents = list(contents)
+
+                words_counts = dict(
+                    Text.objects.filter(id__in = [text_id for _, text_id in contents])
+                                .values_list('id', 'words_count')
+                )
+                read_times = {publication_id: 2 for publication_id in batch}
+                for publication_id, text_id in contents:
+                    read_times[publication_id] += words_counts.get(text_id, 0) // 180 # 180 words per minute
+
+                model.objects.bulk_update(
+                    [model(id = publication_id, read_time = read_time)
+                     for publication_id, read_time in read_times.items()],
+                    ['read_time']
+                )
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {len(publications_ids)}')
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from publications.articles.models import Article
+from publications.articles.serializers import ArticleListSerializer
+from publications.articles.views import article_service
+from users.models import User
+import timeit
+import uuid
+
+class Command(BaseCommand):
+    help = 'Compare rendering a page of articles row by row and with a many=True serializer (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type = int, nargs = '+', default = [4, 50, 500])
+        parser.add_argument('--repeat', type = int, default = 20)
+
+    def handle(self, *args, **options):
+        sizes, repeat = options['sizes'], options['repeat']
+
+        with transaction.atomic():
+            author = User.objects.create(username = f'benchmark-{uuid.uuid4().hex[:8]}')
+            articles = Article.objects.bulk_create([
+                Article(author = author, title = f'Title {index}', intro_text = 'intro_text', level = 'easy')
+                for index in range(max(sizes))
+            ])
+            Article.mention.through.objects.bulk_create([
+                Article.mention.through(article = article, user = author) for article in articles
+            ])
+
+            for size in sizes:
+                page = list(article_service.get_all_publications().filter(author = author)[:size])
+
+                def per_row():
+                    return [ArticleListSerializer(article).data for article in page]
+
+                def many():
+                    return ArticleListSerializer(page, many = True).data
+
+                if JSONRenderer().render(per_row()) != JSONRenderer().render(many()):
+                    raise AssertionError('many=True output differs')
+
+                per_row_time = min(timeit.repeat(per_row, number = 1, repeat = repeat)) / size
+                many_time = min(timeit.repeat(many, number = 1, repeat = repeat)) / size
+                self.stdout.write(
+                    f'{size:>5} rows: per row {per_row_time * 1e6:7.1f} us/row, '
+                    f'many=True {many_time * 1e6:7.1f} us/row ({per_row_time / many_time:.2f}x)'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from publications.articles.models import Article
+from publications.models import SearchDocument
+from publications.search import (BasicSearchBackend, MemorySearchBackend, Fts5SearchBackend,
+                                 FTS5_TABLE, get_search_terms)
+import random
+import statistics
+import string
+import time
+import tracemalloc
+
+class Command(BaseCommand):
+    help = 'Compare the search backends on a generated corpus: query latency and memory (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type = int, default = 5000)
+        parser.add_argument('--vocabulary', type = int, default = 20000)
+        parser.add_argument('--body-words', type = int, default = 150)
+        parser.add_argument('--queries', type = int, default = 100)
+        parser.add_argument('--seed', type = int, default = 1)
+
+    def _generate_words(self, rand, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rand.choices(string.ascii_lowercase, k = rand.randint(3, 10))))
+        return sorted(words)
+
+    def _generate_queries(self, rand, words, weights, size):
+        queries = []
+        for _ in range(size):
+            terms = rand.choices(words, weights, k = rand.randint(1, 2))
+            if rand.random() < 0.3: # a word still being typed
+                terms[-1] = terms[-1][:max(3, len(terms[-1]) - 2)]
+            queries.append(' '.join(terms))
+        return queries
+
+    def _measure(self, backend, queries, content_types_ids):
+        latencies, found = [], 0
+        for query in queries:
+            terms = get_search_terms(query)
+            start = time.perf_counter()
+            found += len(backend.search(terms, content_types_ids, 0, 10))
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], found / len(queries)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options['seed'])
+        words = self._generate_words(rand, options['vocabulary'])
+        weights = [1 / rank for rank in range(1, len(words) + 1)] # zipf like, a few words are everywhere
+        rand.shuffle(words)
+        article_ct = ContentType.objects.get_for_model(Article)
+
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create([
+                SearchDocument(
+                    publication_content_type = article_ct,
+                    publication_object_id = 10 ** 9 + index, # not real publications
+                    title = ' '.join(rand.choices(words, weights, k = 6)),
+                    body = ' '.join(rand.choices(words, weights, k = options['body_words'])),
+                ) for index in range(options['documents'])
+            ], batch_size = 1000)
+            queries = self._generate_queries(rand, words, weights, options['queries'])
+
+            backends = {'icontains': BasicSearchBackend()}
+            if connection.vendor == 'sqlite' and FTS5_TABLE in connection.introspection.table_names():
+                backends['fts5'] = Fts5SearchBackend()
+
+            memory = backends['memory'] = MemorySearchBackend()
+            start = time.perf_counter()
+            memory.load()
+            load_time = time.perf_counter() - start
+            tracemalloc.start() # tracing slows the load down, so it is measured on a second one
+            index = MemorySearchBackend().load()
+            memory_size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del index
+            stats = memory.index.get_stats()
+
+            self.stdout.write(
+                f"corpus: {stats['documents']} documents, {stats['terms']} terms, {stats['postings']} postings"
+            )
+            self.stdout.write(
+                f"memory index: loaded in {load_time * 1e3:.0f} ms, {memory_size / 2 ** 20:.1f} MiB in python, "
+                f"{stats['bytes'] / 2 ** 20:.1f} MiB of it in posting arrays"
+            )
+            for name, backend in backends.items():
+                median, p95, found = self._measure(backend, queries, [article_ct.id])
+                self.stdout.write(
+                    f'{name:>10}: median {median * 1e3:7.2f} ms, p95 {p95 * 1e3:7.2f} ms, {found:.1f} results per query'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from publications.search import search_index, MemorySearchBackend
+
+class Command(BaseCommand):
+    help = 'Index the published articles and news for the search again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 500)
+
+    def handle(self, *args, **options):
+        indexed = search_index.rebuild(options['batch_size'])
+        self.stdout.write(f'{indexed} publications indexed with the {type(search_index.backend).__name__}')
+        if isinstance(search_index.backend, MemorySearchBackend): # only this process, the others reload on their own
+            stats = search_index.backend.index.get_stats()
+            self.stdout.write(f"memory index: {stats['terms']} terms, {stats['postings']} postings, {stats['bytes']} bytes")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from publications.services import rating_service
+from publications.articles.models import Article
+from publications.news.models import News
+from publications.posts.models import Post
+
+class Command(BaseCommand):
+    help = 'Rebuild the rating counters and the votes of users in redis from the likes and dislikes tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 500)
+
+    def _get_votes(self, model, field_name, publications_ids):
+        field = model._meta.get_field(field_name)
+        return list(
+            field.remote_field.through.objects.filter(**{f'{field.m2m_field_name()}__in': publications_ids})
+                                              .values_list(field.m2m_field_name(), field.m2m_reverse_field_name())
+        )
+
+    def _count_votes(self, votes):
+        counts = {}
+        for publication_id, _ in votes:
+            counts[publication_id] = counts.get(publication_id, 0) + 1
+        return counts
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model in (Article, News, Post):
+            publication_app = model._meta.app_label
+            publications_ids = list(model.objects.order_by('id').values_list('id', flat = True))
+            rating_service.delete_user_votes(publication_app)
+
+            for start in range(0, len(publications_ids), batch_size):
+                batch = publications_ids[start:start + batch_size]
+                likes = self._get_votes(model, 'likes', batch)
+                dislikes = self._get_votes(model, 'dislikes', batch)
+
+                likes_count, dislikes_count = self._count_votes(likes), self._count_votes(dislikes)
+                rating_service.set_ratings(publication_app, {
+                    publication_id: likes_count.get(publication_id, 0) - dislikes_count.get(publication_id, 0)
+                    for publication_id in batch
+                })
+                rating_service.set_user_votes(publication_app, 'like', likes)
+                rating_service.set_user_votes(publication_app, 'dislike', dislikes)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {len(publications_ids)}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+from taggit.models import TaggedItem
+from publications.tags import tag_counter
+from publications.articles.models import Article
+from publications.news.models import News
+
+class Command(BaseCommand):
+    help = 'Rebuild the tag counters of the popular tags in redis from the tagged items table'
+
+    def handle(self, *args, **options):
+        for model in (Article, News):
+            counts = dict(
+                TaggedItem.objects.filter(content_type = ContentType.objects.get_for_model(model))
+                                  .values_list('tag_id')
+                                  .annotate(count = Count('id'))
+                                  .values_list('tag_id', 'count')
+            )
+            tag_counter.set_counts(model._meta.app_label, counts)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {len(counts)} tags')
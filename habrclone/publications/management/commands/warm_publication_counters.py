@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from publications.connections import get_redis
+from publications.counters import counter_snapshot
+
+class Command(BaseCommand):
+    help = 'Load views and rating of publications into redis from the PublicationCounter table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 500)
+        parser.add_argument('--force', action = 'store_true',
+                            help = 'Overwrite counters which are already in redis')
+
+    def handle(self, *args, **options):
+        loaded = counter_snapshot.warm_up(get_redis(), options['batch_size'], options['force'])
+        self.stdout.write(f'Publications: {loaded}')
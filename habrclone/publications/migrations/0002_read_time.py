@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='text',
+            name='words_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
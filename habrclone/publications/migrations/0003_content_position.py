@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+def number_contents(apps, schema_editor):
+    # existing contents keep their creation order
+    Content = apps.get_model('publications', 'Content')
+    contents = Content.objects.order_by('publication_content_type', 'publication_object_id', 'id')
+
+    batch, publication, position = [], None, 0
+    for content in contents.only('id', 'publication_content_type', 'publication_object_id').iterator():
+        key = (content.publication_content_type_id, content.publication_object_id)
+        position = position + 1 if key == publication else 0
+        publication = key
+
+        content.position = position
+        batch.append(content)
+        if len(batch) >= 500:
+            Content.objects.bulk_update(batch, ['position'])
+            batch = []
+    Content.objects.bulk_update(batch, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('publications', '0002_read_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['publication_content_type', 'publication_object_id', 'position'], name='publication_publica_96b11a_idx'),
+        ),
+        migrations.RunPython(number_contents, migrations.RunPython.noop),
+    ]
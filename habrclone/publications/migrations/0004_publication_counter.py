@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('publications', '0003_content_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('publication_object_id', models.PositiveIntegerField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('rating', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('publication_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='publication_counters', to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['publication_content_type', '-rating'], name='publication_publica_6b365e_idx'), models.Index(fields=['publication_content_type', '-views'], name='publication_publica_ed057a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='publicationcounter',
+            constraint=models.UniqueConstraint(fields=('publication_content_type', 'publication_object_id'), name='unique_publication_counter'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+# taggit only indexes tag_id alone and (content_type_id, object_id), tag pages look up
+# the publications of a tag, so they need the tag first and the object ids covered
+INDEX_NAME = 'taggit_taggeditem_tag_ct_object_idx'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0004_publication_counter'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON taggit_taggeditem (tag_id, content_type_id, object_id)',
+            f'DROP INDEX IF EXISTS {INDEX_NAME}',
+        ),
+    ]
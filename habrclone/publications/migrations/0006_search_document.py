@@ -0,0 +1,88 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# sqlite: an external content FTS5 table kept in sync by triggers
+FTS5_SQL = [
+    '''CREATE VIRTUAL TABLE publications_searchdocument_fts USING fts5(
+           title, body, content = 'publications_searchdocument', content_rowid = 'id',
+           tokenize = 'unicode61 remove_diacritics 2'
+       )''',
+    '''CREATE TRIGGER publications_searchdocument_ai AFTER INSERT ON publications_searchdocument BEGIN
+           INSERT INTO publications_searchdocument_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+       END''',
+    '''CREATE TRIGGER publications_searchdocument_ad AFTER DELETE ON publications_searchdocument BEGIN
+           INSERT INTO publications_searchdocument_fts (publications_searchdocument_fts, rowid, title, body)
+           VALUES ('delete', old.id, old.title, old.body);
+       END''',
+    '''CREATE TRIGGER publications_searchdocument_au AFTER UPDATE ON publications_searchdocument BEGIN
+           INSERT INTO publications_searchdocument_fts (publications_searchdocument_fts, rowid, title, body)
+           VALUES ('delete', old.id, old.title, old.body);
+           INSERT INTO publications_searchdocument_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+       END''',
+]
+FTS5_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS publications_searchdocument_ai',
+    'DROP TRIGGER IF EXISTS publications_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS publications_searchdocument_au',
+    'DROP TABLE IF EXISTS publications_searchdocument_fts',
+]
+
+# postgres: a GIN index on the same expression the search query uses
+POSTGRES_SQL = [
+    '''CREATE INDEX publications_searchdocument_vector_idx ON publications_searchdocument USING gin ((
+           setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+       ))''',
+]
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS publications_searchdocument_vector_idx',
+]
+
+def has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_SQL
+    elif vendor == 'sqlite' and has_fts5(schema_editor):
+        statements = FTS5_SQL
+    else:
+        return # the search falls back to the plain table
+    for statement in statements:
+        schema_editor.execute(statement)
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_REVERSE_SQL, 'sqlite': FTS5_REVERSE_SQL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('publications', '0005_taggeditem_tag_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('publication_object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=250)),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('publication_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='contenttypes.contenttype')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('publication_content_type', 'publication_object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
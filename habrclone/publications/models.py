@@ -20,6 +20,55 @@ class Content(models.Model):
                                                                        'file')})
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
+    position = models.PositiveIntegerField(default = 0)
+
+    class Meta:
+        indexes = [
+            # publication body is one range scan in order
+            models.Index(fields = ['publication_content_type', 'publication_object_id', 'position']),
+        ]
+
+class PublicationCounter(models.Model):
+    '''Durable copy of the redis views and rating, written by the snapshot task'''
+    publication_content_type = models.ForeignKey(ContentType, on_delete = models.CASCADE,
+                                                 related_name = 'publication_counters')
+    publication_object_id = models.PositiveIntegerField()
+    publication = GenericForeignKey('publication_content_type', 'publication_object_id')
+
+    views = models.PositiveIntegerField(default = 0)
+    rating = models.IntegerField(default = 0)
+    updated_at = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['publication_content_type', 'publication_object_id'],
+                                    name = 'unique_publication_counter'),
+        ]
+        indexes = [
+            # top rated / most viewed of one publication type in sql
+            models.Index(fields = ['publication_content_type', '-rating']),
+            models.Index(fields = ['publication_content_type', '-views']),
+        ]
+
+class SearchDocument(models.Model):
+    '''
+    Searchable text of a published publication: the title and the intro with
+    its text items as the body. The full text index over it depends on the database.
+    '''
+    publication_content_type = models.ForeignKey(ContentType, on_delete = models.CASCADE,
+                                                 related_name = 'search_documents')
+    publication_object_id = models.PositiveIntegerField()
+    publication = GenericForeignKey('publication_content_type', 'publication_object_id')
+
+    title = models.CharField(max_length = 250)
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['publication_content_type', 'publication_object_id'],
+                                    name = 'unique_search_document'),
+        ]
 
 class PublishedManager(models.Manager):
     def get_queryset(self):
@@ -39,6 +88,7 @@ class Publication(models.Model):
     dislikes = models.ManyToManyField(User, related_name = '%(class)s_dislikes',
                                       blank = True)
     status = models.BooleanField(default = True)
+    read_time = models.PositiveIntegerField(default = 2) # minutes, kept in sync with text items
 
     objects = models.Manager()
     published = PublishedManager()
@@ -46,16 +96,33 @@ class Publication(models.Model):
     class Meta:
         abstract = True
         indexes = [
-            models.Index(fields = ['status']),
+            models.Index(fields = ['status', 'created_at']), # published feeds
+            models.Index(fields = ['author', 'status', 'created_at']), # mine feeds
         ]
 
+    def update_read_time(self):
+        publication_ct = ContentType.objects.get_for_model(self)
+        text_ct = ContentType.objects.get_for_model(Text)
+        texts_ids = Content.objects.filter(
+            publication_content_type = publication_ct,
+            publication_object_id = self.id,
+            content_type = text_ct
+        ).values('object_id')
+        words_counts = Text.objects.filter(id__in = texts_ids).values_list('words_count', flat = True)
+
+        self.read_time = 2 + sum(words_count // 180 for words_count in words_counts) # 180 words per minute
+        self.__class__.objects.filter(id = self.id).update(read_time = self.read_time)
+
 class ItemBase(models.Model):
     creator = models.ForeignKey(User, related_name = '%(class)s_items',
                                 on_delete = models.CASCADE)
     item_name = models.CharField(max_length = 5, blank = True, default = '')
 
-    def save(self, *args, **kwargs):
+    def fill_computed_fields(self): # bulk_create skips save(), so it is called there too
         self.item_name = self.__class__.__name__.lower()
+
+    def save(self, *args, **kwargs):
+        self.fill_computed_fields()
         return super().save(*args, **kwargs)
 
     class Meta:
@@ -63,6 +130,11 @@ class ItemBase(models.Model):
 
 class Text(ItemBase):
     content = models.TextField()
+    words_count = models.PositiveIntegerField(default = 0)
+
+    def fill_computed_fields(self):
+        super().fill_computed_fields()
+        self.words_count = len( self.content.split() )
 
 class File(ItemBase):
     file = models.FileField(upload_to = 'files')
@@ -1,12 +1,8 @@
 from django.contrib import admin
+from ..admin import PublicationTagsAdmin
 from .models import News
 
 @admin.register(News)
-class NewsAdmin(admin.ModelAdmin):
+class NewsAdmin(PublicationTagsAdmin):
     list_display = ['id', 'title', 'author', 'status', 'tag_list']
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('tags')
-
-    def tag_list(self, obj):
-        return u", ".join(tag.name for tag in obj.tags.all())
@@ -10,5 +10,5 @@ class News(Publication):
 
     tags = TaggableManager()
 
-    class Meta:
+    class Meta(Publication.Meta):
         verbose_name_plural = 'News'
\ No newline at end of file
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from ..serializers import PublicationListSerializer
+from ..serializers import PublicationListSerializer, PublicationTagsField
 from ..models import User
 from .models import News
 from taggit.serializers import (TagListSerializerField,
@@ -18,7 +18,7 @@ class NewsSerializer(TaggitSerializer, serializers.ModelSerializer):
         ]
 
 class NewsListSerializer(TaggitSerializer, PublicationListSerializer):
-    tags = TagListSerializerField()
+    tags = PublicationTagsField()
 
     class Meta:
         model = News
@@ -5,6 +5,7 @@ from rest_framework import status
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from ..views import PublicationEditAPIView
+from ..search import search_index
 from .serializers import NewsSerializer
 from .services import NewsService
 from .models import News
@@ -56,7 +57,8 @@ class ListAPIView(APIView):
                             "intro_image": "/media/images/image_name.jpeg",
                             "read_time": 2,
                             "views": 10,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -67,14 +69,41 @@ class ListAPIView(APIView):
                 'page_number', openapi.IN_QUERY,
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'tag', openapi.IN_QUERY,
+                description = "Tag name to filter by, repeat it or separate the names with commas for several tags",
+                type = openapi.TYPE_ARRAY, items = openapi.Items(type = openapi.TYPE_STRING),
+                collection_format = 'multi'
+            ),
+            openapi.Parameter(
+                'tag_mode', openapi.IN_QUERY,
+                description = "'or' (default) - publications with any of the tags, 'and' - with every tag",
+                type = openapi.TYPE_STRING, enum = ['or', 'and']
+            ),
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        news = news_service.get_all_publications()
-        page = news_service.paginate_publications( news, page_number )
-        news_data = news_service.list(page)
+        tags, tags_mode = news_service.get_tags_filter(request.GET.getlist('tag'), request.GET.get('tag_mode'))
+        
+        news_data, cursors = news_service.get_list_page(
+            page_number, cursor, page_size, user = request.user, tags = tags, tags_mode = tags_mode
+        )
+        if cursors is not None:
+            return Response({ 'results': news_data, **cursors })
 
         return Response( news_data )
 
@@ -101,9 +130,11 @@ class ListAPIView(APIView):
 
         serializer = NewsSerializer(data = request.data)
         if serializer.is_valid():
-            serializer.save(author = request.user)
+            news = serializer.save(author = request.user)
             if serializer.validated_data['status']:
                 news_service.add_publication_creation()
+                news_service.cache.bump_version() # the new publication opens the feed
+                search_index.update(news)
 
             return Response(status = status.HTTP_201_CREATED)
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
@@ -160,7 +191,8 @@ class DetailAPIView(APIView):
                             "intro_image": None,
                             "read_time": 2,
                             "views": 6,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -171,11 +203,39 @@ class DetailAPIView(APIView):
         }
     )
     def get(self, request, news_id):
-        data = news_service.detail(news_id)
+        data = news_service.detail(news_id, request.user)
         if isinstance(data, int):
             return Response(status = data)
         return Response(data)
 
+class RankedAPIView(APIView):
+
+    @swagger_auto_schema(
+        operation_description = "Retrieve the top (by rating) or trending (recent views and votes) news.",
+        manual_parameters = [
+            openapi.Parameter(
+                'page_number', openapi.IN_QUERY,
+                description = "Page number for pagination",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Same items as the list, best first",
+            )
+        }
+    )
+    def get(self, request, feed):
+        news_data = news_service.get_ranked_page(
+            feed, request.GET.get('page_number', 1), request.GET.get('page_size'), request.user
+        )
+        return Response( news_data )
+
 class MineAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -218,7 +278,8 @@ class MineAPIView(APIView):
                             "intro_image": "/media/images/image_name.jpeg",
                             "read_time": 2,
                             "views": 10,
-                            "rating": -1
+                            "rating": -1,
+                            "my_vote": None
                         }
                     ]
                 }
@@ -235,14 +296,30 @@ class MineAPIView(APIView):
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER
             ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        news = news_service.get_all_publications().filter( author = request.user )
-        page = news_service.paginate_publications( news, page_number )
-        news_data = news_service.list(page)
+        news_data, cursors = news_service.get_list_page(
+            page_number, cursor, page_size,
+            publications_list = news_service.get_all_publications().filter( author = request.user ),
+            user = request.user
+        )
+        if cursors is not None:
+            return Response({ 'results': news_data, **cursors })
 
         return Response( news_data )
 
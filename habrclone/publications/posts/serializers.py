@@ -15,5 +15,5 @@ class PostListSerializer(PublicationListSerializer):
 
     class Meta:
         model = Post
-        exclude = PublicationListSerializer.Meta.exclude
+        exclude = PublicationListSerializer.Meta.exclude + ['read_time']
 
@@ -7,31 +7,21 @@ from django.contrib.contenttypes.models import ContentType
 from .serializers import PostListSerializer
 
 class PostService(PublicationService):
+    list_serializer = PostListSerializer
+
     def __init__(self):
         self.publication_app = 'posts'
         self.model_name = 'Post'
         PublicationService.__init__(self)
     
-    def _post_data(self, post, contents_data):
-        post_data = PostListSerializer(post).data
-        post_data.update({ 
-            'items': contents_data,
-            'views': self._get_publication_view(post.id),
-            'rating': self._get_publication_rating(post.id)
-        })
-        return post_data
-
-    def list(self, posts):
-        if not posts:
-            return []
-        
+    def _render_list(self, posts):
         prefetched_contents = self._prefetch_contents(posts)
-        post_list = []
-        for post in posts:
-            self._add_publication_view(post.id)
-            data = self._post_data(post, prefetched_contents[post.id])
-            post_list.append(data)
+        post_list = PublicationService._render_list(self, posts)
+        for post, post_data in zip(posts, post_list):
+            post_data['items'] = prefetched_contents[post.id]
         return post_list
 
-    def detail(self):
-        pass
\ No newline at end of file
+    def _add_counters(self, posts_data, user = None):
+        # every shown post is viewed, cached pages too
+        self._add_publications_views([post_data['id'] for post_data in posts_data])
+        return PublicationService._add_counters(self, posts_data, user)
@@ -1,9 +1,12 @@
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework_simplejwt.tokens import AccessToken
 from unittest.mock import patch
 from ..models import User, Content, Text
 from .models import Post
+from .views import post_service
 
 class PostTest(APITestCase):
     
@@ -43,6 +46,57 @@ class PostTest(APITestCase):
             else:
                 self.assertEqual( len(items), 0)
 
+    @patch('publications.posts.views.post_service.r')
+    def test_post_list_counters(self, mock_obj):
+        mock_obj.mget.side_effect = lambda keys: [b'-2' if key.endswith(':rating') else b'7' for key in keys]
+
+        res = self.client.get(self.post_list_url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(mock_obj.mget.call_count, 1)
+        for post in res.data:
+            self.assertEqual(post['views'], 7)
+            self.assertEqual(post['rating'], -2)
+
+    @patch('publications.posts.views.post_service.r')
+    def test_post_list_cursor(self, mock_obj):
+        for _ in range(5):
+            Post.objects.create( author = self.user )
+        posts_ids = list(Post.published.order_by('-created_at', '-id').values_list('id', flat = True))
+
+        res = self.client.get(self.post_list_url, {'cursor': ''})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([post['id'] for post in res.data['results']], posts_ids[:4])
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(self.post_list_url, {'cursor': res.data['next']})
+        self.assertEqual([post['id'] for post in res.data['results']], posts_ids[4:])
+        self.assertIsNone(res.data['next'])
+
+        res = self.client.get(self.post_list_url, {'cursor': res.data['previous']})
+        self.assertEqual([post['id'] for post in res.data['results']], posts_ids[:4])
+
+    @override_settings(CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       PUBLICATION_VIEWS_BUFFER = None)
+    @patch('publications.posts.views.post_service.r')
+    def test_post_list_cache(self, mock_obj):
+        cache.clear()
+        self.client.get(self.post_list_url, {'cursor': ''})
+        self.client.credentials()
+        with self.assertNumQueries(0):
+            res = self.client.get(self.post_list_url, {'cursor': ''})
+        self.assertIn('next', res.data)
+        self.assertEqual(mock_obj.pipeline.return_value.execute.call_count, 2) # cached page is viewed too
+
+    @patch('publications.posts.views.post_service.r')
+    def test_post_list_queries(self, mock_obj):
+        posts = post_service.get_all_publications()
+
+        # count, page, mentions, contents with their items
+        with self.assertNumQueries(4):
+            page = post_service.paginate_publications( posts, 1 )
+            posts_data = post_service.list(page)
+        self.assertEqual(len(posts_data), 2)
+
     @patch('publications.articles.views.article_service.r')
     def test_create_article(self, mock_obj):
         mock_obj.return_value = b'0' # mock redis
@@ -6,5 +6,7 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.ListAPIView.as_view(), name = 'list'),
     path('mine/', views.MineAPIView.as_view(), name = 'mine'),
+    path('top/', views.RankedAPIView.as_view(), {'feed': 'top'}, name = 'top'),
+    path('trending/', views.RankedAPIView.as_view(), {'feed': 'trending'}, name = 'trending'),
     path('edit/<int:post_id>/', views.EditAPIView.as_view(), name = 'edit')
 ]
\ No newline at end of file
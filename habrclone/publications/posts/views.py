@@ -57,7 +57,8 @@ class ListAPIView(APIView):
                               }
                             ],
                             "views": 31,
-                            "rating": 0
+                            "rating": 0,
+                            "my_vote": None
                           }
                         ]
                 }
@@ -69,14 +70,26 @@ class ListAPIView(APIView):
                 'page_number', openapi.IN_QUERY,
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        posts = post_service.get_all_publications()
-        page = post_service.paginate_publications( posts, page_number )
-        posts_data = post_service.list(page)
+        posts_data, cursors = post_service.get_list_page( page_number, cursor, page_size, user = request.user )
+        if cursors is not None:
+            return Response({ 'results': posts_data, **cursors })
 
         return Response( posts_data )
     
@@ -106,10 +119,39 @@ class ListAPIView(APIView):
             serializer.save(author = request.user)
             if serializer.validated_data['status']:
                 post_service.add_publication_creation()
+                post_service.cache.bump_version() # the new publication opens the feed
                 
             return Response(status = status.HTTP_201_CREATED)
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
 
+class RankedAPIView(APIView):
+
+    @swagger_auto_schema(
+        operation_description = "Retrieve the top (by rating) or trending (recent views and votes) posts.",
+        manual_parameters = [
+            openapi.Parameter(
+                'page_number', openapi.IN_QUERY,
+                description = "Page number for pagination",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Same items as the list, best first",
+            )
+        }
+    )
+    def get(self, request, feed):
+        posts_data = post_service.get_ranked_page(
+            feed, request.GET.get('page_number', 1), request.GET.get('page_size'), request.user
+        )
+        return Response( posts_data )
+
 class MineAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -153,7 +195,8 @@ class MineAPIView(APIView):
                               }
                             ],
                             "views": 31,
-                            "rating": 0
+                            "rating": 0,
+                            "my_vote": None
                           }
                         ]
                 }
@@ -170,14 +213,30 @@ class MineAPIView(APIView):
                 description = "Page number for pagination",
                 type = openapi.TYPE_INTEGER
             ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description = "Cursor for keyset pagination, pass it empty for the first page. The response is {results, next, previous}",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
         ]
     )
     def get(self, request):
         page_number = request.GET.get('page_number', 1)
+        cursor = request.GET.get('cursor')
+        page_size = request.GET.get('page_size')
         
-        posts = post_service.get_all_publications().filter( author = request.user )
-        page = post_service.paginate_publications( posts, page_number )
-        posts_data = post_service.list(page)
+        posts_data, cursors = post_service.get_list_page(
+            page_number, cursor, page_size,
+            publications_list = post_service.get_all_publications().filter( author = request.user ),
+            user = request.user
+        )
+        if cursors is not None:
+            return Response({ 'results': posts_data, **cursors })
 
         return Response( posts_data )
 
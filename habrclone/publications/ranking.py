@@ -0,0 +1,78 @@
+from django.conf import settings
+import time
+
+class PublicationRanking:
+    '''
+    Redis sorted sets behind the top and trending feeds, every update is one ZINCRBY (O(log n)).
+        {app}:top             - publications by rating
+        {app}:trending:{hour} - views and votes got during the hour
+        {app}:trending        - sum of the last PUBLICATIONS_TRENDING_HOURS buckets, the older
+                                the bucket the smaller its weight; rebuilt when it expires
+    '''
+    feeds = ('top', 'trending')
+
+    def get_top_key(self, publication_app):
+        return f'{publication_app}:top'
+
+    def get_trending_key(self, publication_app, hour = None):
+        if hour is None:
+            return f'{publication_app}:trending'
+        return f'{publication_app}:trending:{hour}'
+
+    def _get_hour(self):
+        return int(time.time() // 3600)
+
+    def _add_trending(self, pipe, publication_app, publication_id, points):
+        bucket_key = self.get_trending_key(publication_app, self._get_hour())
+        pipe.zincrby(bucket_key, points, publication_id)
+        pipe.expire(bucket_key, (settings.PUBLICATIONS_TRENDING_HOURS + 1) * 3600)
+
+    def add_views(self, pipe, publication_app, publication_id, views):
+        self._add_trending(pipe, publication_app, publication_id, views)
+
+    def add_rating(self, pipe, publication_app, publication_id, delta):
+        if not delta:
+            return
+        pipe.zincrby(self.get_top_key(publication_app), delta, publication_id)
+        self._add_trending(pipe, publication_app, publication_id,
+                           delta * settings.PUBLICATIONS_TRENDING_RATING_WEIGHT)
+
+    def set_ratings(self, pipe, publication_app, ratings):
+        if ratings:
+            pipe.zadd(self.get_top_key(publication_app), ratings)
+
+    def remove(self, r, publication_app, publications_ids):
+        '''Drops deleted publications, the hourly buckets too or the next rebuild brings them back'''
+        hour = self._get_hour()
+        keys = [self.get_top_key(publication_app), self.get_trending_key(publication_app)] + [
+            self.get_trending_key(publication_app, hour - age) for age in range(settings.PUBLICATIONS_TRENDING_HOURS + 1)
+        ]
+        pipe = r.pipeline(transaction = False)
+        for key in keys:
+            pipe.zrem(key, *publications_ids)
+        pipe.execute()
+
+    def _build_trending(self, r, publication_app):
+        hour = self._get_hour()
+        weights = {
+            self.get_trending_key(publication_app, hour - age): settings.PUBLICATIONS_TRENDING_DECAY ** age
+            for age in range(settings.PUBLICATIONS_TRENDING_HOURS)
+        }
+        pipe = r.pipeline()
+        pipe.zunionstore(self.get_trending_key(publication_app), weights)
+        pipe.expire(self.get_trending_key(publication_app), settings.PUBLICATIONS_TRENDING_TIMEOUT)
+        pipe.execute()
+
+    def get_page(self, r, publication_app, feed, page_number, page_size):
+        '''Publications ids of the page, best first'''
+        if feed == 'top':
+            key = self.get_top_key(publication_app)
+        else:
+            key = self.get_trending_key(publication_app)
+            if not r.exists(key):
+                self._build_trending(r, publication_app)
+
+        start = (page_number - 1) * page_size
+        return [int(publication_id) for publication_id in r.zrevrange(key, start, start + page_size - 1)]
+
+publication_ranking = PublicationRanking()
@@ -0,0 +1,255 @@
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Q, Case, When, IntegerField
+from django.utils.functional import cached_property
+from .articles.services import ArticleService
+from .news.services import NewsService
+from .inverted_index import InvertedIndex
+from .loaders import content_loader
+from .models import SearchDocument
+from threading import Lock
+import re
+import time
+
+FTS5_TABLE = 'publications_searchdocument_fts'
+POSTGRES_VECTOR = "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')"
+
+def get_search_terms(query):
+    '''Lower case words of the query, everything else is dropped so no query syntax reaches the database'''
+    return re.findall(r'\w+', (query or '').lower())[:settings.PUBLICATIONS_SEARCH_MAX_TERMS]
+
+class SearchBackend(ABC):
+    '''
+    Finds publications having every term, a term matches the words it starts with.
+    search() returns ranked (content type id, publication id) pairs of one page.
+    '''
+
+    @abstractmethod
+    def search(self, terms, content_types_ids, offset, limit):
+        pass
+
+class Fts5SearchBackend(SearchBackend):
+    '''sqlite FTS5 table over SearchDocument, ranked by bm25 with the title weighing 4 times the body'''
+
+    def search(self, terms, content_types_ids, offset, limit):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        placeholders = ', '.join(['%s'] * len(content_types_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''SELECT document.publication_content_type_id, document.publication_object_id
+                    FROM {FTS5_TABLE} JOIN publications_searchdocument document ON document.id = {FTS5_TABLE}.rowid
+                    WHERE {FTS5_TABLE} MATCH %s AND document.publication_content_type_id IN ({placeholders})
+                    ORDER BY bm25({FTS5_TABLE}, 4.0, 1.0), document.id DESC
+                    LIMIT %s OFFSET %s''',
+                [match, *content_types_ids, limit, offset]
+            )
+            return cursor.fetchall()
+
+class PostgresSearchBackend(SearchBackend):
+    '''tsvector with the title weighted A and the body B, matched on the GIN index of the same expression'''
+
+    def search(self, terms, content_types_ids, offset, limit):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        placeholders = ', '.join(['%s'] * len(content_types_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''SELECT publication_content_type_id, publication_object_id
+                    FROM publications_searchdocument
+                    WHERE ({POSTGRES_VECTOR}) @@ to_tsquery('simple', %s)
+                      AND publication_content_type_id IN ({placeholders})
+                    ORDER BY ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s)) DESC, id DESC
+                    LIMIT %s OFFSET %s''',
+                [query, *content_types_ids, query, limit, offset]
+            )
+            return cursor.fetchall()
+
+class BasicSearchBackend(SearchBackend):
+    '''icontains over the documents for databases without a full text index, title matches first'''
+
+    def search(self, terms, content_types_ids, offset, limit):
+        documents = SearchDocument.objects.filter(publication_content_type_id__in = content_types_ids)
+        in_title = Q()
+        for term in terms:
+            documents = documents.filter(Q(title__icontains = term) | Q(body__icontains = term))
+            in_title &= Q(title__icontains = term)
+        documents = documents.annotate(
+            in_title = Case(When(in_title, then = 1), default = 0, output_field = IntegerField())
+        ).order_by('-in_title', '-id')
+        return list(documents.values_list('publication_content_type_id', 'publication_object_id')[offset:offset + limit])
+
+class MemorySearchBackend(SearchBackend):
+    '''
+    Pure python InvertedIndex, for sqlite builds without FTS5 and for tests.
+    A process loads it from SearchDocument on the first search and follows the documents
+    it saves itself through signals, a reload after PUBLICATIONS_SEARCH_MEMORY_TIMEOUT
+    seconds brings the changes made by other processes.
+    '''
+
+    def __init__(self):
+        self.index = None
+        self.loaded_at = None
+        self.lock = Lock()
+
+    def load(self):
+        index = InvertedIndex()
+        documents = SearchDocument.objects.values_list(
+            'publication_content_type_id', 'publication_object_id', 'title', 'body'
+        ).iterator(chunk_size = 2000)
+        index.load(((content_type_id, publication_id), title, body)
+                   for content_type_id, publication_id, title, body in documents)
+        self.index, self.loaded_at = index, time.monotonic() # searches use the old index meanwhile
+        return index
+
+    def get_index(self):
+        if self.index is None or time.monotonic() - self.loaded_at > settings.PUBLICATIONS_SEARCH_MEMORY_TIMEOUT:
+            with self.lock:
+                if self.index is None or time.monotonic() - self.loaded_at > settings.PUBLICATIONS_SEARCH_MEMORY_TIMEOUT:
+                    self.load()
+        return self.index
+
+    def add(self, document):
+        if self.index is not None: # not loaded yet, the load reads it from the table
+            self.index.add((document.publication_content_type_id, document.publication_object_id),
+                           document.title, document.body)
+
+    def remove(self, document):
+        if self.index is not None:
+            self.index.remove((document.publication_content_type_id, document.publication_object_id))
+
+    def search(self, terms, content_types_ids, offset, limit):
+        content_types_ids = set(content_types_ids)
+        return self.get_index().search(terms, offset, limit, key_filter = lambda key: key[0] in content_types_ids)
+
+SEARCH_BACKENDS = {
+    'fts5': Fts5SearchBackend,
+    'postgres': PostgresSearchBackend,
+    'memory': MemorySearchBackend,
+    'basic': BasicSearchBackend,
+}
+
+class SearchIndex:
+    '''
+    Keeps SearchDocument in step with the published articles and news and
+    renders ranked search pages with the list payload of the publications.
+    '''
+
+    @cached_property
+    def services(self):
+        return {'articles': ArticleService(), 'news': NewsService()}
+
+    @cached_property
+    def backend(self):
+        name = settings.PUBLICATIONS_SEARCH_BACKEND
+        if name is None: # picked by the database, the index is made by the migration
+            if connection.vendor == 'postgresql':
+                name = 'postgres'
+            elif connection.vendor == 'sqlite':
+                name = 'fts5' if FTS5_TABLE in connection.introspection.table_names() else 'memory'
+            else:
+                name = 'basic'
+        return SEARCH_BACKENDS[name]()
+
+    def _get_document(self, publication, texts):
+        body = [publication.intro_text] + [content['item']['content'] for content in texts if content['item']]
+        return {'title': publication.title, 'body': '\n'.join(body)}
+
+    def update(self, publication):
+        '''Reindexes one publication, call it after its text, texts or status changed'''
+        publication_app = publication._meta.app_label
+        if publication_app not in self.services:
+            return
+        if not publication.status:
+            return self.delete(publication)
+
+        publication_ct = ContentType.objects.get_for_model(publication)
+        texts = content_loader.get_contents(publication_ct, [publication.id], ['text'])[publication.id]
+        SearchDocument.objects.update_or_create(
+            publication_content_type = publication_ct,
+            publication_object_id = publication.id,
+            defaults = self._get_document(publication, texts)
+        )
+
+    def delete(self, publication):
+        if publication._meta.app_label not in self.services:
+            return
+        SearchDocument.objects.filter(
+            publication_content_type = ContentType.objects.get_for_model(publication),
+            publication_object_id = publication.id
+        ).delete()
+
+    def rebuild(self, batch_size = 500):
+        '''Indexes every published publication again, returns their number'''
+        indexed = 0
+        for service in self.services.values():
+            SearchDocument.objects.filter(publication_content_type = service.model_ct).delete()
+            publications = service.manager.only('id', 'title', 'intro_text').order_by('id')
+            for start in range(0, publications.count(), batch_size):
+                batch = list(publications[start:start + batch_size])
+                texts = content_loader.get_contents(service.model_ct, [publication.id for publication in batch], ['text'])
+                SearchDocument.objects.bulk_create([
+                    SearchDocument(
+                        publication_content_type = service.model_ct,
+                        publication_object_id = publication.id,
+                        **self._get_document(publication, texts[publication.id])
+                    ) for publication in batch
+                ])
+                indexed += len(batch)
+
+        if isinstance(self.backend, MemorySearchBackend): # bulk_create sent no signals
+            self.backend.load()
+        return indexed
+
+    def _get_memory_backend(self):
+        # only a backend this process already picked, a memory index is not loaded before the first search
+        backend = self.__dict__.get('backend')
+        return backend if isinstance(backend, MemorySearchBackend) else None
+
+    def document_saved(self, document):
+        backend = self._get_memory_backend()
+        if backend:
+            backend.add(document)
+
+    def document_deleted(self, document):
+        backend = self._get_memory_backend()
+        if backend:
+            backend.remove(document)
+
+    def search(self, query, publications_types = None, page_number = 1, page_size = None, user = None):
+        '''List payloads of the page with their type, best match first'''
+        terms = get_search_terms(query)
+        services = {
+            publication_app: service for publication_app, service in self.services.items()
+            if not publications_types or publication_app in publications_types
+        }
+        if not terms or not services:
+            return []
+
+        service = next(iter(services.values()))
+        page_size = service.get_page_size(page_size)
+        page_number = service.get_page_number(page_number) # capped, the offset must fit the database integer
+        if not page_number:
+            return []
+
+        content_types = {service.model_ct.id: publication_app for publication_app, service in services.items()}
+        found = self.backend.search(terms, list(content_types), (page_number - 1) * page_size, page_size)
+
+        publications_ids = {publication_app: [] for publication_app in services}
+        for content_type_id, publication_id in found:
+            publications_ids[content_types[content_type_id]].append(publication_id)
+
+        rendered = {}
+        for publication_app, ids in publications_ids.items():
+            if not ids:
+                continue
+            service = services[publication_app]
+            publications = list(service.get_all_publications().filter(id__in = ids))
+            for publication_data in service.list(publications, user):
+                rendered[(publication_app, publication_data['id'])] = {'type': publication_app, **publication_data}
+
+        return [rendered[(content_types[content_type_id], publication_id)]
+                for content_type_id, publication_id in found
+                if (content_types[content_type_id], publication_id) in rendered] # unpublished since indexing
+
+search_index = SearchIndex()
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from taggit.serializers import TagListSerializerField
 from .models import Content, Text, Image, File, Video, User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -27,6 +28,13 @@ class VideoSerializer(serializers.ModelSerializer):
         model = Video
         fields = ['item_name', 'url']
 
+
+ITEM_SERIALIZERS = {
+    Text: TextSerializer,
+    File: FileSerializer,
+    Image: ImageSerializer,
+    Video: VideoSerializer,
+}
     
 class ContentSerializer(serializers.ModelSerializer):
     item = serializers.SerializerMethodField()
@@ -36,21 +44,46 @@ class ContentSerializer(serializers.ModelSerializer):
         fields = ['id', 'item']
 
     def get_item(self, obj):
-        item = obj.item
-        if isinstance(item, Text):
-            return TextSerializer(item).data
-        elif isinstance(item, File):
-            return FileSerializer(item).data
-        elif isinstance(item, Image):
-            return ImageSerializer(item).data
-        elif isinstance(item, Video):
-            return VideoSerializer(item).data
-        return None
+        item_serializer = ITEM_SERIALIZERS.get(type(obj.item))
+        if item_serializer is None:
+            return None
+        return item_serializer(obj.item).data
+
+
+class ContentOrderSerializer(serializers.Serializer):
+    order = serializers.ListField(child = serializers.IntegerField(), allow_empty = False)
+
+    def validate_order(self, order):
+        if len(set(order)) != len(order):
+            raise serializers.ValidationError('Contents must not repeat.')
+        return order
+
+class VoteSerializer(serializers.Serializer):
+    vote = serializers.ChoiceField(choices = ['like', 'dislike'])
+
+class UserCardField(serializers.Field):
+    '''UserSerializer output, taken from context['user_cards'] when the service prepared them for the page'''
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user):
+        user_cards = self.context.get('user_cards')
+        if user_cards is not None and user.id in user_cards:
+            return user_cards[user.id]
+        return UserSerializer(user).data
 
+class PublicationTagsField(TagListSerializerField):
+    '''Tags from context['tags'] when the service loaded them for the page'''
+    def get_attribute(self, instance):
+        tags = self.context.get('tags')
+        if tags is not None and instance.id in tags:
+            return tags[instance.id]
+        return super().get_attribute(instance)
 
 class PublicationListSerializer(serializers.ModelSerializer):
-    author = UserSerializer()
-    mention = UserSerializer(many = True)
+    author = UserCardField()
+    mention = serializers.ListField(child = UserCardField(), source = 'mention.all', read_only = True)
 
     class Meta:
         exclude = ['likes', 'dislikes']
@@ -1,50 +1,120 @@
-from abc import ABC, abstractmethod 
+from abc import ABC
 from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Content
-from .serializers import ContentSerializer
-from datetime import date
-import redis
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from taggit.models import TaggedItem
+from .buffers import views_buffer
+from .connections import get_redis
+from .cache import PublicationCache, user_card_cache
+from .ranking import publication_ranking
+from .loaders import content_loader, tag_loader, ITEM_TYPES
+from datetime import date, datetime
+import base64
+import binascii
+import hashlib
+import json
 
 class PublicationService(ABC):
+    '''
+    Services are built when views are imported, so the constructor must not
+    touch redis or the database: everything else is resolved on first use.
+    '''
+    max_page_number = 10 ** 6
+    list_serializer = None # set by every app, renders the list payload
+
     def __init__(self):
-        self.r = redis.Redis(
-            host = settings.REDIS_HOST,
-            port = settings.REDIS_PORT,
-            db = settings.REDIS_DB
-        )
-        
-        self.model, self.model_ct = self.get_model_and_model_ct(
-            self.publication_app,
-            self.model_name
-        )
-        self.text_model, self.text_model_ct = self.get_model_and_model_ct('publications', 'Text')
-        self.manager = self.model_ct.model_class().published
+        self.cache = PublicationCache(self.publication_app)
+
+    @cached_property
+    def r(self):
+        return get_redis()
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.publication_app, self.model_name)
+
+    @cached_property
+    def model_ct(self):
+        return ContentType.objects.get_for_model(self.model)
+
+    @cached_property
+    def text_model_ct(self):
+        return self.get_model_and_model_ct('publications', 'Text')[1]
+
+    @cached_property
+    def manager(self):
+        return self.model.published
 
     def get_model_and_model_ct(self, publication_app, model_name): # dont delete the parmeters!!!
         model = apps.get_model(publication_app, model_name)
         model_ct = ContentType.objects.get_for_model(model)
         return model, model_ct
 
-    def get_all_publications(self):
+    def get_all_publications(self, tags = None, tags_mode = 'or'):
         ## add when user is auth dont recommend him his publications
 
         ## add algorithm or smth else for recommendation
 
-        publications_list = self.manager.defer('likes', 'dislikes').select_related('author')
+        publications_list = self.manager.defer('likes', 'dislikes')\
+                                        .select_related('author')\
+                                        .order_by('-created_at', '-id') # served by the (status, created_at) index
+        if tags:
+            publications_list = self.filter_by_tags(publications_list, tags, tags_mode)
         
-        if self.publication_app != 'posts':
-            publications_list = publications_list.prefetch_related('mention', 'tags')    
-        else:
-            publications_list = publications_list.prefetch_related('mention')    
+        # tags are loaded for the page by the tag loader
+        return publications_list.prefetch_related('mention')
 
-        return publications_list
+    def get_tags_filter(self, tags, tags_mode = None):
+        '''
+        Tag names from ?tag=a&tag=b or ?tag=a,b and the mode, 'or' unless 'and' is asked.
+        Returns ([], 'or') when there is nothing to filter by.
+        '''
+        names = []
+        for value in tags or []:
+            for name in value.split(','):
+                name = name.strip()
+                if name and name not in names:
+                    names.append(name)
+        return names[:settings.PUBLICATIONS_MAX_FILTER_TAGS], 'and' if tags_mode == 'and' else 'or'
+
+    def filter_by_tags(self, publications_list, tags, tags_mode = 'or'):
+        '''
+        Publications with any (or) or every (and) of the tags.
+        Every tag is an IN subquery on the (tag_id, content_type_id, object_id) index,
+        so the database never reads the tagged items of other tags or other apps.
+        '''
+        tagged_items = TaggedItem.objects.filter(content_type = self.model_ct)
+        if tags_mode == 'and':
+            for tag in tags:
+                publications_list = publications_list.filter(
+                    id__in = tagged_items.filter(tag__name = tag).values('object_id')
+                )
+            return publications_list
+        return publications_list.filter(id__in = tagged_items.filter(tag__name__in = tags).values('object_id'))
         
-    def paginate_publications(self, publications_list, page_number):
-        paginator = Paginator(publications_list, 4)
+    def get_page_size(self, page_size = None):
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            return settings.PUBLICATIONS_PAGE_SIZE
+        return max(1, min(page_size, settings.PUBLICATIONS_MAX_PAGE_SIZE))
+
+    def get_page_number(self, page_number = 1):
+        '''The number the paginator serves: a broken one is the first page, below 1 is empty'''
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            return 1
+        return max(0, min(page_number, self.max_page_number)) # every page past it is empty too
+
+    def paginate_publications(self, publications_list, page_number, page_size = None):
+        paginator = Paginator(publications_list, self.get_page_size(page_size))
         try:
             publications = paginator.page(page_number)
         except PageNotAnInteger:
@@ -53,65 +123,190 @@ class PublicationService(ABC):
         except EmptyPage:
             # If page_number is out of range return None
             return None
-        return publications.object_list
+        return list(publications.object_list) # evaluate the page once, services iterate it several times
+
+    def get_list_page(self, page_number = 1, cursor = None, page_size = None, publications_list = None, user = None,
+                      tags = None, tags_mode = 'or'):
+        '''
+        Returns (publications_data, cursors), cursors is None without cursor.
+        The common feed and its tag pages are cached, a custom publications_list (e.g. mine) is not.
+        '''
+        if publications_list is not None:
+            publications_data, cursors = self._paginate_and_render(publications_list, page_number, cursor, page_size)
+            return self._add_counters(publications_data, user), cursors
+
+        page_number = self.get_page_number(page_number)
+        page_key = self._get_cursor_key(cursor) if cursor is not None else f'page:{page_number}'
+        if tags:
+            # tag names may have spaces and any length, the key gets their digest
+            tags_key = hashlib.md5(json.dumps(sorted(tags)).encode()).hexdigest()
+            page_key = f'tags:{tags_mode}:{tags_key}:{page_key}'
+        key = self.cache.get_list_key(page_key, self.get_page_size(page_size))
+        cached = self.cache.get_list(key)
+        if cached is not None:
+            publications_data, cursors = cached
+            return self._add_counters(publications_data, user), cursors
+
+        publications_data, cursors = self._paginate_and_render(
+            self.get_all_publications(tags, tags_mode), page_number, cursor, page_size
+        )
+        self.cache.set_list(key, (publications_data, cursors))
+        return self._add_counters(publications_data, user), cursors
+
+    def get_ranked_page(self, feed, page_number = 1, page_size = None, user = None):
+        '''Page of the top or trending feed, the order comes from redis, the rows from one id__in query'''
+        page_number = self.get_page_number(page_number) # capped, redis takes 64 bit ranges only
+        if not page_number:
+            return []
+        publications_ids = publication_ranking.get_page(
+            self.r, self.publication_app, feed, page_number, self.get_page_size(page_size)
+        )
+        if not publications_ids:
+            return []
+
+        publications = {publication.id: publication
+                        for publication in self.get_all_publications().filter(id__in = publications_ids)}
+        missing_ids = [publication_id for publication_id in publications_ids if publication_id not in publications]
+        if missing_ids: # drafts keep their scores for when they are published again, only deleted rows leave
+            existing_ids = set(self.model.objects.filter(id__in = missing_ids).values_list('id', flat = True))
+            deleted_ids = [publication_id for publication_id in missing_ids if publication_id not in existing_ids]
+            if deleted_ids:
+                publication_ranking.remove(self.r, self.publication_app, deleted_ids)
+
+        return self.list([publications[publication_id] for publication_id in publications_ids
+                          if publication_id in publications], user)
+
+    def _paginate_and_render(self, publications_list, page_number, cursor, page_size):
+        cursors = None
+        if cursor is not None:
+            page, cursors = self.paginate_publications_by_cursor(publications_list, cursor, page_size)
+        else:
+            page = self.paginate_publications(publications_list, page_number, page_size)
+
+        return self._render_list(page) if page else [], cursors
+
+    def paginate_publications_by_cursor(self, publications_list, cursor, page_size = None):
+        # keyset pagination on (created_at, id): no COUNT(*) and no OFFSET,
+        # so every page costs the same whatever its depth
+        page_size = self.get_page_size(page_size)
+        direction, created_at, publication_id = self._decode_cursor(cursor)
+
+        if direction == 'next':
+            publications_list = publications_list.order_by('-created_at', '-id')
+            if created_at is not None:
+                publications_list = publications_list.filter(
+                    Q(created_at__lt = created_at) |
+                    Q(created_at = created_at, id__lt = publication_id)
+                )
+        else:
+            publications_list = publications_list.order_by('created_at', 'id').filter(
+                Q(created_at__gt = created_at) |
+                Q(created_at = created_at, id__gt = publication_id)
+            )
+
+        publications = list(publications_list[:page_size + 1]) # one extra row tells if there is more
+        has_more = len(publications) > page_size
+        publications = publications[:page_size]
+
+        if direction == 'next':
+            has_next, has_previous = has_more, created_at is not None
+        else:
+            publications.reverse()
+            has_next, has_previous = True, has_more
+
+        cursors = {'next': None, 'previous': None}
+        if publications and has_next:
+            cursors['next'] = self._encode_cursor('next', publications[-1])
+        if publications and has_previous:
+            cursors['previous'] = self._encode_cursor('previous', publications[0])
+        return publications, cursors
+
+    def _encode_cursor(self, direction, publication):
+        position = [direction, publication.created_at.isoformat(), publication.id]
+        return base64.urlsafe_b64encode( json.dumps(position).encode() ).decode()
+
+    def _get_cursor_key(self, cursor):
+        # the decoded position, any broken cursor is the first page
+        direction, created_at, publication_id = self._decode_cursor(cursor)
+        if created_at is None:
+            return 'cursor:first'
+        return f'cursor:{direction}:{created_at.isoformat()}:{publication_id}'
+
+    def _decode_cursor(self, cursor):
+        try:
+            direction, created_at, publication_id = json.loads( base64.urlsafe_b64decode(cursor) )
+            if direction not in ('next', 'previous'):
+                raise ValueError
+            if type(publication_id) is not int or not 0 < publication_id < 2 ** 63: # a database integer
+                raise ValueError
+            created_at = datetime.fromisoformat(created_at)
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+            return direction, created_at, publication_id
+        except (binascii.Error, ValueError, TypeError, OverflowError):
+            # If cursor is empty or broken deliver the first page
+            return 'next', None, None
     
-    def _prefetch_contents(self, publications):
-        publications_ids = publications.values_list('id', flat = True)
-        contents = self._get_publication_contents(publications_ids)
-
-        prefetched_contents = {publication_id: [] for publication_id in publications_ids}
-        for content in contents:
-            publication_id = content.publication_object_id
-            content_data = ContentSerializer(content).data
-            prefetched_contents[publication_id].append(content_data)
-        return prefetched_contents
+    def _get_serializer_context(self, publications):
+        # authors and mentions of the page come from the user card cache
+        users = []
+        for publication in publications:
+            users.append(publication.author)
+            users += publication.mention.all()
+        context = {'user_cards': user_card_cache.get_many(users)}
+
+        if self.publication_app != 'posts':
+            context['tags'] = tag_loader.get_tags(self.model, [publication.id for publication in publications])
+        return context
+
+    def _prefetch_contents(self, publications, items_names = ITEM_TYPES.keys()):
+        publications_ids = [publication.id for publication in publications]
+        return content_loader.get_contents(self.model_ct, publications_ids, items_names)
         
     def _get_publication_key(self, publication_id):
         return f'{self.publication_app}:{publication_id}'
 
-    def _get_publication_contents(self, publications_ids):
-        return Content.objects.filter(
-            publication_content_type = self.model_ct,
-            publication_object_id__in = publications_ids
-        ).prefetch_related('item')
-
-    def _add_publication_view(self, publication_id):
-        publication_key = self._get_publication_key(publication_id)
-        publication_views = f'{publication_key}:views'
-        self.r.incr(publication_views)
-
-    def _get_publication_view(self, publication_id):
-        publication_key = self._get_publication_key(publication_id)
-        publication_views = f'{publication_key}:views'
-        views = self.r.get(publication_views)
-        if not views:
-            return 0
-        return int( views.decode()) # binary string to int
-
-
-    def _get_publication_rating(self, publication_id):
-        publication_key = self._get_publication_key(publication_id)
-        publication_rating_key = f'{publication_key}:rating'
-        if not self.r.exists(publication_rating_key):
-            return 0
-
-        publication_rating = self.r.get(publication_rating_key)
-        rating = int( publication_rating.decode() ) # binary string to number
-        return rating 
-
-    def _get_publication_read_time(self, publication_id, contents_dict = {}):
-        
-        if publication_id not in contents_dict:
-            return 2 
-        contents = contents_dict[publication_id]
+    def _add_publications_views(self, publications_ids):
+        views_keys = [f'{self._get_publication_key(publication_id)}:views'
+                      for publication_id in publications_ids]
+        views_buffer.add(self.r, views_keys)
 
-        read_time = 2 # initial minutes 
-        for content in contents:
-            text = content.item.content
-            words_count = len( text.split() )
-            read_time += words_count // 180 # 180 words per minute
+    def _add_counters(self, publications_data, user = None):
+        publications_ids = [data['id'] for data in publications_data]
+        counters = self._get_publications_counters(publications_ids)
+        votes = self._get_user_votes(user, publications_ids)
+        for data in publications_data:
+            data.update(counters[data['id']])
+            data['my_vote'] = votes.get(data['id'])
+        return publications_data
 
-        return read_time
+    def _get_user_votes(self, user, publications_ids):
+        if user is None or not user.is_authenticated or not publications_ids:
+            return {}
+
+        user_votes_key = rating_service.get_user_votes_key(self.publication_app, user.id)
+        scores = self.r.hmget(user_votes_key, publications_ids) # one call for the whole page
+        return {publication_id: rating_service.decode_vote(score)
+                for publication_id, score in zip(publications_ids, scores)}
+
+    def _get_publications_counters(self, publications_ids):
+        keys = []
+        for publication_id in publications_ids:
+            publication_key = self._get_publication_key(publication_id)
+            keys += [f'{publication_key}:views', f'{publication_key}:rating']
+
+        if not keys:
+            return {}
+
+        values = self.r.mget(keys) # one round trip for the whole page, missing keys are None
+        counters = {}
+        for index, publication_id in enumerate(publications_ids):
+            views, rating = values[2 * index], values[2 * index + 1]
+            counters[publication_id] = {
+                'views': int(views) if views else 0,
+                'rating': int(rating) if rating else 0,
+            }
+        return counters
 
     def add_publication_creation(self):
         today = date.today()
@@ -123,10 +318,128 @@ class PublicationService(ABC):
         key = f'{today}:{self.publication_app}'
         return self.r.get(key)
 
-    @abstractmethod
-    def list(self):
-        pass
+    def list(self, publications, user = None):
+        if not publications:
+            return []
+        return self._add_counters(self._render_list(publications), user)
+
+    def _render_list(self, publications):
+        '''Static part of the list payload, counters are added on top of it'''
+        return list(self.list_serializer( # fields are bound once for the page
+            publications, many = True, context = self._get_serializer_context(publications)
+        ).data)
+
+class PublicationDetailMixin:
+    '''Cached detail page, for the publication services of apps which have one'''
+
+    def detail(self, publication_id, user = None):
+        publication_data = self.cache.get_detail(publication_id)
+        if publication_data is None:
+            try:
+                publication = self.manager.get(id = publication_id)
+            except self.model.DoesNotExist:
+                return 404
+            publication_data = self._render_detail(publication)
+            self.cache.set_detail(publication_id, publication_data)
+
+        self._add_publications_views([publication_id])
+        return self._add_counters([publication_data], user)[0]
+
+    def _render_detail(self, publication):
+        '''Static part of the detail payload, counters are added on top of it'''
+        publication_data = self.list_serializer(publication, context = self._get_serializer_context([publication])).data
+        # read_time is stored, only the detail page needs the text items
+        publication_data['items'] = self._prefetch_contents([publication], ['text'])[publication.id]
+        return publication_data
+
+class RatingService:
+    '''
+    Likes and dislikes of publications, the {app}:{id}:rating counters and
+    the {app}:votes:{user_id} hashes (publication id -> 1 or -1) with the votes of every user.
+    A vote writes the through tables directly (no m2m_changed), so the counter
+    is changed once, by the difference between the old and the new vote.
+    '''
+    scores = {'like': 1, 'dislike': -1}
+    fields = {'like': 'likes', 'dislike': 'dislikes'}
+
+    @cached_property
+    def r(self):
+        return get_redis()
+
+    def get_rating_key(self, publication_app, publication_id):
+        return f'{publication_app}:{publication_id}:rating'
+
+    def get_user_votes_key(self, publication_app, user_id):
+        return f'{publication_app}:votes:{user_id}'
+
+    def decode_vote(self, score):
+        return {b'1': 'like', b'-1': 'dislike'}.get(score)
+
+    def _get_vote_row(self, publication, vote, user):
+        # through model and the lookup of the user's row in it
+        field = publication._meta.get_field(self.fields[vote])
+        return field.remote_field.through, {
+            field.m2m_field_name(): publication,
+            field.m2m_reverse_field_name(): user,
+        }
+
+    def vote(self, publication, user, vote = None):
+        '''vote is 'like', 'dislike' or None to take the vote back, repeating a vote changes nothing'''
+        delta = 0
+        with transaction.atomic():
+            for other_vote, score in self.scores.items():
+                if other_vote != vote:
+                    through, lookup = self._get_vote_row(publication, other_vote, user)
+                    deleted, _ = through.objects.filter(**lookup).delete()
+                    delta -= deleted * score
+
+            if vote is not None:
+                through, lookup = self._get_vote_row(publication, vote, user)
+                _, created = through.objects.get_or_create(**lookup)
+                delta += self.scores[vote] if created else 0
+
+        publication_app = publication._meta.app_label
+        user_votes_key = self.get_user_votes_key(publication_app, user.id)
+        pipe = self.r.pipeline() # MULTI / EXEC
+        pipe.incrby(self.get_rating_key(publication_app, publication.id), delta)
+        publication_ranking.add_rating(pipe, publication_app, publication.id, delta)
+        if vote is None:
+            pipe.hdel(user_votes_key, publication.id)
+        else:
+            pipe.hset(user_votes_key, publication.id, self.scores[vote])
+        rating = pipe.execute()[0]
+
+        return {'vote': vote, 'rating': int(rating)}
+
+    def apply_votes(self, publication_app, vote, votes, added):
+        '''votes are (publication_id, user_id) rows added to or removed from the vote table'''
+        score = self.scores[vote] if added else -self.scores[vote]
+        pipe = self.r.pipeline()
+        for publication_id, user_id in votes:
+            pipe.incrby(self.get_rating_key(publication_app, publication_id), score)
+            publication_ranking.add_rating(pipe, publication_app, publication_id, score)
+            if added:
+                pipe.hset(self.get_user_votes_key(publication_app, user_id), publication_id, self.scores[vote])
+            else:
+                pipe.hdel(self.get_user_votes_key(publication_app, user_id), publication_id)
+        pipe.execute()
+
+    def set_ratings(self, publication_app, ratings):
+        pipe = self.r.pipeline()
+        for publication_id, rating in ratings.items():
+            pipe.set(self.get_rating_key(publication_app, publication_id), rating)
+        publication_ranking.set_ratings(pipe, publication_app, ratings)
+        pipe.execute()
+
+    def set_user_votes(self, publication_app, vote, votes):
+        pipe = self.r.pipeline()
+        for publication_id, user_id in votes:
+            pipe.hset(self.get_user_votes_key(publication_app, user_id), publication_id, self.scores[vote])
+        pipe.execute()
+
+    def delete_user_votes(self, publication_app):
+        keys = list(self.r.scan_iter(match = self.get_user_votes_key(publication_app, '*')))
+        if keys:
+            self.r.delete(*keys)
 
-    @abstractmethod
-    def detail(self):
-        pass
\ No newline at end of file
+rating_service = RatingService()
@@ -1,30 +1,78 @@
-from django.conf import settings
-import redis
-
-r = redis.Redis(host = settings.REDIS_HOST,
-                port = settings.REDIS_PORT,
-                db = settings.REDIS_DB)
-
-def likes_changed(sender, instance, action, **kwargs):
-    app_name = instance._meta.app_label
-    instance_id = instance.id
-
-    instance_key = f'{app_name}:{instance_id}'
-    rating_key = f'{instance_key}:rating'
-
-    if action == "post_add":
-        r.incr(rating_key)
-    elif action == "post_remove":
-        r.decr(rating_key)
-    
-def dislikes_changed(sender, instance, action, **kwargs):
-    app_name = instance._meta.app_label
-    instance_id = instance.id
-
-    instance_key = f'{app_name}:{instance_id}'
-    rating_key = f'{instance_key}:rating'
-
-    if action == "post_add":
-        r.decr(rating_key)
-    elif action == "post_remove":
-        r.incr(rating_key)
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from .services import rating_service
+from .search import search_index
+from .loaders import tag_loader
+from .tags import tag_counter, TAGGED_PUBLICATIONS
+
+def _get_through_fields(sender, publication_model):
+    publication_field = user_field = None
+    for field in sender._meta.fields:
+        if field.related_model is publication_model:
+            publication_field = field
+        elif field.related_model is get_user_model():
+            user_field = field
+    return publication_field, user_field
+
+def _get_votes(sender, instance, reverse, model, pk_set):
+    '''(publication_id, user_id) rows which really exist, pk_set is None for clear'''
+    publication_model = model if reverse else type(instance)
+    publication_field, user_field = _get_through_fields(sender, publication_model)
+    instance_field, other_field = (user_field, publication_field) if reverse else (publication_field, user_field)
+
+    votes = sender.objects.filter(**{instance_field.attname: instance.pk})
+    if pk_set is not None:
+        votes = votes.filter(**{f'{other_field.attname}__in': pk_set})
+    return list(votes.values_list(publication_field.attname, user_field.attname))
+
+def votes_changed(sender, instance, action, reverse, model, pk_set, vote, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # remove sends every requested pk, keep only the votes which are going to be deleted
+        instance._removed_votes = _get_votes(sender, instance, reverse, model, pk_set)
+        return
+
+    if action == 'post_add': # pk_set has only the added pks here
+        votes = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    elif action in ('post_remove', 'post_clear'):
+        votes = instance.__dict__.pop('_removed_votes', [])
+    else:
+        return
+
+    if votes:
+        publication_model = model if reverse else type(instance)
+        rating_service.apply_votes(publication_model._meta.app_label, vote, votes,
+                                   added = action == 'post_add')
+
+def likes_changed(sender, **kwargs):
+    votes_changed(sender, vote = 'like', **kwargs)
+
+def dislikes_changed(sender, **kwargs):
+    votes_changed(sender, vote = 'dislike', **kwargs)
+
+def _tagged_item_changed(instance, amount):
+    publication_ct = ContentType.objects.get_for_id(instance.content_type_id) # cached
+    publication_model, publication_id = publication_ct.model_class(), instance.object_id
+    if publication_model is not None: # cached tag names, a read before the commit would cache the old ones
+        transaction.on_commit(lambda: tag_loader.delete(publication_model, publication_id))
+
+    publication_app = publication_ct.app_label
+    if publication_app in TAGGED_PUBLICATIONS:
+        tag_id = instance.tag_id # a rolled back edit must not be counted
+        transaction.on_commit(lambda: tag_counter.add(publication_app, tag_id, amount))
+
+def tagged_item_saved(sender, instance, created, raw = False, **kwargs):
+    # taggit creates and deletes items one by one for add, set, remove, clear
+    # and when the publication is deleted, so these two signals see every change
+    if created and not raw:
+        _tagged_item_changed(instance, 1)
+
+def tagged_item_deleted(sender, instance, **kwargs):
+    _tagged_item_changed(instance, -1)
+
+def search_document_saved(sender, instance, raw = False, **kwargs):
+    if not raw:
+        search_index.document_saved(instance)
+
+def search_document_deleted(sender, instance, **kwargs):
+    search_index.document_deleted(instance)
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from taggit.models import Tag
+from .connections import get_redis
+
+# apps whose publications have tags
+TAGGED_PUBLICATIONS = ('articles', 'news')
+
+class TagCounter:
+    '''
+    Publications per tag in a redis sorted set {app}:tags (tag id: count).
+    Tagged items are counted one by one when they are created or deleted, so
+    the popular tags are a ZREVRANGE of N members and one query for their names
+    instead of a GROUP BY over every tagged item.
+    '''
+
+    @cached_property
+    def r(self):
+        return get_redis()
+
+    def get_key(self, publication_app):
+        return f'{publication_app}:tags'
+
+    def _get_popular_key(self, publication_app, limit):
+        return f'publications:{publication_app}:popular_tags:{limit}'
+
+    def add(self, publication_app, tag_id, amount):
+        key = self.get_key(publication_app)
+        pipe = self.r.pipeline()
+        pipe.zincrby(key, amount, tag_id)
+        pipe.zremrangebyscore(key, '-inf', 0) # unused tags leave the set
+        pipe.execute()
+
+    def set_counts(self, publication_app, counts):
+        '''Replaces the whole set, counts are {tag_id: publications}'''
+        pipe = self.r.pipeline()
+        pipe.delete(self.get_key(publication_app))
+        if counts:
+            pipe.zadd(self.get_key(publication_app), counts)
+        pipe.execute()
+
+    def get_limit(self, limit = None):
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return settings.PUBLICATIONS_POPULAR_TAGS_SIZE
+        return max(1, min(limit, settings.PUBLICATIONS_MAX_POPULAR_TAGS_SIZE))
+
+    def get_popular(self, publication_app, limit = None):
+        '''[{name, slug, count}] of the limit most used tags, cached for PUBLICATIONS_POPULAR_TAGS_TIMEOUT'''
+        limit = self.get_limit(limit)
+        popular = cache.get(self._get_popular_key(publication_app, limit))
+        if popular is not None:
+            return popular
+
+        counts = [(int(tag_id), int(count)) for tag_id, count
+                  in self.r.zrevrange(self.get_key(publication_app), 0, limit - 1, withscores = True)]
+        tags = Tag.objects.in_bulk([tag_id for tag_id, _ in counts])
+        popular = [
+            {'name': tags[tag_id].name, 'slug': tags[tag_id].slug, 'count': count}
+            for tag_id, count in counts if tag_id in tags
+        ]
+        cache.set(self._get_popular_key(publication_app, limit), popular, settings.PUBLICATIONS_POPULAR_TAGS_TIMEOUT)
+        return popular
+
+tag_counter = TagCounter()
@@ -0,0 +1,12 @@
+from celery import shared_task
+from .buffers import views_buffer
+from .connections import get_redis
+from .counters import counter_snapshot
+
+@shared_task
+def flush_publication_views():
+    return views_buffer.flush(get_redis())
+
+@shared_task
+def snapshot_publication_counters():
+    return counter_snapshot.snapshot(get_redis())
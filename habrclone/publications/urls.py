@@ -4,10 +4,22 @@ from . import views
 app_name = 'publications'
 
 urlpatterns = [
+    path('contents/<publication_type>/<int:publication_id>/order/',
+          views.ContentOrderAPIView.as_view(), name = 'content_order'),
+    path('contents/<publication_type>/<int:publication_id>/bulk/',
+          views.ContentBulkAPIView.as_view(), name = 'content_bulk'),
     path('contents/<publication_type>/<int:publication_id>/<model_name>/',
           views.ContentAPIView.as_view(), name = 'content_create'),
     path('items/<model_name>/<int:item_id>/',
           views.ItemDetailAPIView.as_view(), name = 'item_detail'),
+    path('votes/<publication_type>/<int:publication_id>/',
+          views.VoteAPIView.as_view(), name = 'vote'),
+    path('tags/<publication_type>/popular/',
+          views.PopularTagsAPIView.as_view(), name = 'popular_tags'),
+    path('search/',
+          views.SearchAPIView.as_view(), name = 'search'),
+    path('redis/pool/',
+          views.RedisPoolStatsAPIView.as_view(), name = 'redis_pool'),
 
     path('posts/', include('publications.posts.urls', namespace = 'posts')),
     path('articles/', include('publications.articles.urls', namespace = 'articles')),
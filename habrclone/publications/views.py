@@ -1,16 +1,31 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.contenttypes.models import ContentType
 from django.apps import apps
+from django.db import transaction
+from django.db.models import Max
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from publications.posts.models import Post
 from publications.news.models import News
 from publications.articles.models import Article
-from .serializers import TextSerializer, VideoSerializer, ImageSerializer, FileSerializer
+from .serializers import (TextSerializer, VideoSerializer, ImageSerializer, FileSerializer,
+                          ContentOrderSerializer, VoteSerializer)
 from .models import Content, Text, Video, Image, File
+from .cache import invalidate_publication
+from .services import rating_service
+from .connections import get_redis_pool_stats
+from .tags import tag_counter, TAGGED_PUBLICATIONS
+from .search import search_index
+import json
+
+PUBLICATION_MODELS = {
+    'articles': Article,
+    'news': News,
+    'posts': Post,
+}
 
 class ContentAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -24,11 +39,7 @@ class ContentAPIView(APIView):
         }[model_name]
 
     def _get_publication(self, user, publication_type, publication_id):
-        model_class = {
-            'articles': Article,
-            'news': News,
-            'posts': Post,
-        }[publication_type]
+        model_class = PUBLICATION_MODELS[publication_type]
 
         try:
             publication = model_class.published.get(id = publication_id)
@@ -39,6 +50,12 @@ class ContentAPIView(APIView):
         except model_class.DoesNotExist:
             return {'error': 'Publication doesnt exists'}, 404
 
+    def _get_publication_contents(self, publication):
+        return Content.objects.filter(
+            publication_content_type = ContentType.objects.get_for_model(publication),
+            publication_object_id = publication.id
+        )
+
     @swagger_auto_schema(
         operation_description = "Create a new content item (text, image, video, or file) and associate it with a publication.",
         manual_parameters = [
@@ -88,16 +105,191 @@ class ContentAPIView(APIView):
         serializer = self._get_item_serializer( model_name )(data = request.data)
         if serializer.is_valid():
             item = serializer.save(creator = request.user)
+            last_position = self._get_publication_contents(publication).aggregate(
+                position = Max('position')
+            )['position']
             Content.objects.create(
                 publication = publication,
-                item = item
+                item = item,
+                position = 0 if last_position is None else last_position + 1 # append to the end
             )
+            if isinstance(item, Text):
+                publication.update_read_time()
+                search_index.update(publication)
+            invalidate_publication(publication)
 
             return Response(status = status.HTTP_204_NO_CONTENT)
 
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
         
 
+class ContentOrderAPIView(ContentAPIView):
+    http_method_names = ['put']
+
+    @swagger_auto_schema(
+        operation_description = "Reorder all contents of a publication in one request.",
+        manual_parameters = [
+            openapi.Parameter(
+                'Authorization', openapi.IN_HEADER,
+                description = 'Bearer <token>',
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_type', openapi.IN_PATH,
+                description = "The type of publication (articles, news, posts).",
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_id', openapi.IN_PATH,
+                description = "The ID of the publication.",
+                type = openapi.TYPE_INTEGER, required = True
+            ),
+        ],
+        request_body = ContentOrderSerializer,
+        responses = {
+            204: "Contents reordered successfully.",
+            400: "Order must list every content of the publication once.",
+            403: "Not the author of the publication.",
+            404: "Publication does not exist."
+        }
+    )
+    def put(self, request, publication_type, publication_id):
+        error, publication = self._get_publication( request.user, publication_type, publication_id )
+        if error:
+            return Response(error, status = publication)
+
+        serializer = ContentOrderSerializer(data = request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+        order = serializer.validated_data['order']
+        contents = {content.id: content for content in self._get_publication_contents(publication).only('id')}
+        if set(order) != set(contents):
+            return Response({'order': ['Order must list every content of the publication once.']},
+                            status = status.HTTP_400_BAD_REQUEST)
+
+        for position, content_id in enumerate(order):
+            contents[content_id].position = position
+        Content.objects.bulk_update(contents.values(), ['position']) # one UPDATE
+        invalidate_publication(publication)
+
+        return Response(status = status.HTTP_204_NO_CONTENT)
+
+class ContentBulkAPIView(ContentAPIView):
+    http_method_names = ['post']
+    max_items = 100
+
+    def _get_item_data(self, request, block):
+        data = {field: value for field, value in block.items() if field != 'item_name'}
+        for field in ('image', 'file'): # multipart blocks reference uploaded files by name
+            if isinstance(data.get(field), str) and data[field] in request.FILES:
+                data[field] = request.FILES[data[field]]
+        return block.get('item_name'), data
+
+    @swagger_auto_schema(
+        operation_description = "Create an ordered list of content items (text, image, video, file) of a publication in one transaction. "
+                                "Multipart requests send 'items' as a json string and reference uploaded files by their field names.",
+        manual_parameters = [
+            openapi.Parameter(
+                'Authorization', openapi.IN_HEADER,
+                description = 'Bearer <token>',
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_type', openapi.IN_PATH,
+                description = "The type of publication (articles, news, posts).",
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_id', openapi.IN_PATH,
+                description = "The ID of the publication to associate with the contents.",
+                type = openapi.TYPE_INTEGER, required = True
+            ),
+        ],
+        request_body = openapi.Schema(
+            type = openapi.TYPE_OBJECT,
+            properties = {
+                'items': openapi.Schema(
+                    type = openapi.TYPE_ARRAY,
+                    items = openapi.Schema(
+                        type = openapi.TYPE_OBJECT,
+                        properties = {
+                            'item_name': openapi.Schema(type = openapi.TYPE_STRING, description = 'text, image, video or file'),
+                            'content': openapi.Schema(type = openapi.TYPE_STRING, description = 'Content data for text item.'),
+                            'url': openapi.Schema(type = openapi.TYPE_STRING, description = 'Content data for video item.'),
+                            'image': openapi.Schema(type = openapi.TYPE_STRING, description = 'Name of the uploaded image field.'),
+                            'file': openapi.Schema(type = openapi.TYPE_STRING, description = 'Name of the uploaded file field.'),
+                        }
+                    )
+                )
+            }
+        ),
+        responses = {
+            201: "Contents created successfully, returns their ids in order.",
+            400: "Invalid data, errors are returned per item.",
+            403: "Not the author of the publication.",
+            404: "Publication does not exist."
+        }
+    )
+    def post(self, request, publication_type, publication_id):
+        error, publication = self._get_publication( request.user, publication_type, publication_id )
+        if error:
+            return Response(error, status = publication)
+
+        blocks = request.data.get('items')
+        if isinstance(blocks, str):
+            try:
+                blocks = json.loads(blocks)
+            except ValueError:
+                blocks = None
+        if not isinstance(blocks, list) or not blocks or len(blocks) > self.max_items \
+           or not all(isinstance(block, dict) for block in blocks):
+            return Response({'items': [f'Expected a list of 1 to {self.max_items} items.']},
+                            status = status.HTTP_400_BAD_REQUEST)
+
+        # validate everything before writing anything
+        items_serializers, errors = [], []
+        for block in blocks:
+            model_name, data = self._get_item_data(request, block)
+            if model_name not in ('text', 'image', 'video', 'file'):
+                errors.append({'item_name': ['Expected one of text, image, video, file.']})
+                continue
+
+            serializer = self._get_item_serializer( model_name )(data = data)
+            serializer.is_valid()
+            items_serializers.append(serializer)
+            errors.append(serializer.errors)
+
+        if any(errors):
+            return Response({'items': errors}, status = status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            items = []
+            for serializer in items_serializers:
+                item = serializer.Meta.model(creator = request.user, **serializer.validated_data)
+                item.fill_computed_fields()
+                items.append(item)
+
+            for model in (Text, Image, Video, File): # one INSERT per item type
+                model.objects.bulk_create([item for item in items if type(item) is model])
+
+            last_position = self._get_publication_contents(publication).aggregate(
+                position = Max('position')
+            )['position']
+            first_position = 0 if last_position is None else last_position + 1
+            contents = Content.objects.bulk_create([
+                Content(publication = publication, item = item, position = first_position + index)
+                for index, item in enumerate(items)
+            ])
+
+            if any(isinstance(item, Text) for item in items):
+                publication.update_read_time()
+                search_index.update(publication)
+        invalidate_publication(publication)
+
+        return Response({'contents': [content.id for content in contents]},
+                        status = status.HTTP_201_CREATED)
+
 class ItemDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -116,6 +308,14 @@ class ItemDetailAPIView(APIView):
 
         return item_serializer, item    
 
+    def _get_item_publication(self, item):
+        item_ct = ContentType.objects.get_for_model(item)
+        content = Content.objects.filter(
+            content_type = item_ct,
+            object_id = item.id
+        ).first()
+        return content.publication if content else None
+
 
     @swagger_auto_schema(
         operation_description = "Retrieve a specific item based on model name and item ID.",
@@ -210,6 +410,12 @@ class ItemDetailAPIView(APIView):
         serializer = item_serializer( item, data = request.data )
         if serializer.is_valid():
             serializer.save()
+            publication = self._get_item_publication(item)
+            if publication:
+                if isinstance(item, Text):
+                    publication.update_read_time()
+                    search_index.update(publication)
+                invalidate_publication(publication)
 
             return Response(status = status.HTTP_204_NO_CONTENT)
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
@@ -253,16 +459,188 @@ class ItemDetailAPIView(APIView):
         model = apps.get_model('publications', model_name)
         model_ct = ContentType.objects.get_for_model(model)
         try:
-            Content.objects.get(
+            content = Content.objects.get(
                 content_type = model_ct,
                 object_id = item_id
-            ).delete()
+            )
+            publication = content.publication
+            content.delete()
             model_ct.model_class().objects.get(id = item_id).delete() # delete item
         except Content.DoesNotExist:
             return Response({'error': 'Item dont exists'}, status = status.HTTP_404_NOT_FOUND)
 
+        if publication:
+            if isinstance(item, Text):
+                publication.update_read_time()
+                search_index.update(publication)
+            invalidate_publication(publication)
+
         return Response(status = status.HTTP_204_NO_CONTENT)
 
+class VoteAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def _get_publication(self, publication_type, publication_id):
+        model_class = PUBLICATION_MODELS.get(publication_type)
+        if model_class is None:
+            return None
+        return model_class.published.filter(id = publication_id).first()
+
+    @swagger_auto_schema(
+        operation_description = "Like or dislike a publication. Voting again with the same vote changes nothing, the other vote is replaced.",
+        request_body = VoteSerializer,
+        manual_parameters = [
+            openapi.Parameter(
+                'Authorization', openapi.IN_HEADER,
+                description = 'Bearer <token>',
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_type', openapi.IN_PATH,
+                description = "The type of publication (articles, news, posts).",
+                type = openapi.TYPE_STRING, required = True
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Current vote of the user and rating of the publication",
+                examples = {'application/json': {'vote': 'like', 'rating': 3}}
+            ),
+            400: "Invalid vote.",
+            404: "Publication does not exist."
+        }
+    )
+    def post(self, request, publication_type, publication_id):
+        publication = self._get_publication(publication_type, publication_id)
+        if publication is None:
+            return Response({'error': 'Publication doesnt exists'}, status = status.HTTP_404_NOT_FOUND)
+
+        serializer = VoteSerializer(data = request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+        return Response( rating_service.vote(publication, request.user, serializer.validated_data['vote']) )
+
+    @swagger_auto_schema(
+        operation_description = "Take the vote back.",
+        manual_parameters = [
+            openapi.Parameter(
+                'Authorization', openapi.IN_HEADER,
+                description = 'Bearer <token>',
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'publication_type', openapi.IN_PATH,
+                description = "The type of publication (articles, news, posts).",
+                type = openapi.TYPE_STRING, required = True
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Rating of the publication",
+                examples = {'application/json': {'vote': None, 'rating': 2}}
+            ),
+            404: "Publication does not exist."
+        }
+    )
+    def delete(self, request, publication_type, publication_id):
+        publication = self._get_publication(publication_type, publication_id)
+        if publication is None:
+            return Response({'error': 'Publication doesnt exists'}, status = status.HTTP_404_NOT_FOUND)
+
+        return Response( rating_service.vote(publication, request.user) )
+
+class RedisPoolStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description = "Redis connection pool of the worker process which served the request.",
+        responses = {
+            200: openapi.Response(
+                description = "Pool usage",
+                examples = {'application/json': {'pid': 12, 'max_connections': 50, 'created': 3, 'in_use': 1, 'idle': 2}}
+            ),
+            403: "Admins only."
+        }
+    )
+    def get(self, request):
+        return Response( get_redis_pool_stats() )
+
+class PopularTagsAPIView(APIView):
+
+    @swagger_auto_schema(
+        operation_description = "Most used tags of the publication type, most used first.",
+        manual_parameters = [
+            openapi.Parameter(
+                'publication_type', openapi.IN_PATH,
+                description = "The type of publication (articles, news).",
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description = "Number of tags (default 20, max 100)",
+                type = openapi.TYPE_INTEGER
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "Tags with the number of publications",
+                examples = {'application/json': [{'name': 'django', 'slug': 'django', 'count': 12}]}
+            ),
+            404: "Publication type has no tags."
+        }
+    )
+    def get(self, request, publication_type):
+        if publication_type not in TAGGED_PUBLICATIONS:
+            return Response({'error': 'Publication type has no tags'}, status = status.HTTP_404_NOT_FOUND)
+
+        return Response( tag_counter.get_popular(publication_type, request.GET.get('limit')) )
+
+class SearchAPIView(APIView):
+
+    @swagger_auto_schema(
+        operation_description = "Full text search over the published articles and news: titles, intros and text items. "
+                                "Every word of the query must match the start of a word, best matches first.",
+        manual_parameters = [
+            openapi.Parameter(
+                'query', openapi.IN_QUERY,
+                description = "Words to search",
+                type = openapi.TYPE_STRING, required = True
+            ),
+            openapi.Parameter(
+                'type', openapi.IN_QUERY,
+                description = "Publication type to search (articles, news), all of them by default",
+                type = openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_number', openapi.IN_QUERY,
+                description = "Page number for pagination",
+                type = openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'page_size', openapi.IN_QUERY,
+                description = "Publications per page (default 4, max 50)",
+                type = openapi.TYPE_INTEGER
+            ),
+        ],
+        responses = {
+            200: openapi.Response(
+                description = "List payloads of the found publications with their type",
+                examples = {'application/json': [{'type': 'articles', 'id': 1, 'title': 'Understanding Django'}]}
+            ),
+        }
+    )
+    def get(self, request):
+        publication_type = request.GET.get('type')
+        search_data = search_index.search(
+            request.GET.get('query'),
+            publications_types = [publication_type] if publication_type else None,
+            page_number = request.GET.get('page_number', 1),
+            page_size = request.GET.get('page_size'),
+            user = request.user
+        )
+        return Response( search_data )
+
 class PublicationEditAPIView(APIView): # used in sub apps
     permission_classes = [IsAuthenticated]
 
@@ -287,6 +665,8 @@ class PublicationEditAPIView(APIView): # used in sub apps
         serializer = edit_serializer(publication, data = request.data)
         if serializer.is_valid():
             serializer.save()
+            invalidate_publication(publication)
+            search_index.update(publication) # title, intro or status
 
             return Response(status = status.HTTP_204_NO_CONTENT)
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
@@ -300,5 +680,7 @@ class PublicationEditAPIView(APIView): # used in sub apps
         if publication.author != request.user:
             return Response({'error': 'you are not the owner of publication'}, status = status.HTTP_403_FORBIDDEN)
     
+        invalidate_publication(publication) # before delete, it clears the id
+        search_index.delete(publication)
         publication.delete()
         return Response(status = status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -13,6 +13,7 @@ from .serializers import (UserSerializer, UserEditSerializer, ChangePasswordSeri
                           ResetPasswordSerializer, ResetPasswordDoneSerializer, CodeEmailSerializer)
 from .models import User, PasswordReset
 from .tasks import verification_mail,  password_reset_mail
+from publications.cache import invalidate_user
 
 def error_response(errors):
     for field, error_list in errors.items():
@@ -203,6 +204,7 @@ class EditAPIView(APIView):
             username = serializer.validated_data['username']
             if not User.objects.filter(username = username).exclude(pk = user.pk).exists():
                 serializer.save()
+                invalidate_user(user) # author and mentions cards of publications
                 return Response(status = status.HTTP_204_NO_CONTENT)
             return Response({'error': 'Username - Already in use'},
                             status = status.HTTP_400_BAD_REQUEST)